@@ -0,0 +1,62 @@
+"""Benchmark of the cold start of the services, up to the first connection to the broker.
+
+Each measure runs a new interpreter (as a short-lived worker would do) and reports the median wall-clock time:
+    - interpreter: python -c pass, the incompressible part,
+    - import: import of the command line interface,
+    - meter/pv: import, argument parsing, and creation of the brokers, meters, or PV services.
+
+Usage (from the root directory): python benchmarks/startup.py [-n NB_RUNS]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+_TARGET_MS = 100
+
+_SNIPPETS = {
+    "interpreter": "pass",
+    "import": "import pv_simulator.cli",
+    "meter": "from pv_simulator import cli\n"
+             "cli.create_meters(cli.build_parser().parse_args(['meter', '-nb', '100']))\n"
+             "import sys\n"
+             "assert 'pika.connection' not in sys.modules, 'pika has been imported before the first connection'",
+    "pv": "from pv_simulator import cli\n"
+          "cli.create_pv_services(cli.build_parser().parse_args(['pv', '-ids', 'Meter_0', 'Meter_1']))\n"
+          "import sys\n"
+          "assert 'pika.connection' not in sys.modules, 'pika has been imported before the first connection'",
+}
+
+
+def _run(snippet: str, cwd: str, nb_runs: int) -> float:
+    """Returns the median duration, in milliseconds, of the execution of the snippet in a new interpreter."""
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    durations = []
+    for _ in range(nb_runs):
+        start = time.perf_counter()
+        process = subprocess.run([sys.executable, "-c", snippet], cwd=cwd, env=env, stderr=subprocess.PIPE)
+        if process.returncode != 0:
+            raise RuntimeError(process.stderr.decode())
+        durations.append((time.perf_counter() - start) * 1_000)
+    return statistics.median(durations)
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description="Benchmark of the cold start of the services.")
+    arg_parser.add_argument("-n", "--nb-runs", type=int, default=20, help="number of runs per measure. Default: 20")
+    options = arg_parser.parse_args()
+
+    # The PV services create their CSV files in the working directory
+    with tempfile.TemporaryDirectory() as cwd:
+        for name, snippet in _SNIPPETS.items():
+            median_ms = _run(snippet, cwd, options.nb_runs)
+            status = "" if name in ("interpreter", "import") else \
+                (" OK" if median_ms < _TARGET_MS else f" > {_TARGET_MS} ms")
+            print(f"{name:<12} {median_ms:8.1f} ms{status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+from pv_simulator.cli import main
+
+main(prog="python -m pv_simulator")
@@ -0,0 +1,242 @@
+"""This module compacts and reads the history written by the CSV output (see out module).
+
+The CSV output creates one file per meter per day: <BASE_FILE_NAME>-<YEAR>-<MONTH>-<DAY>.csv. Once a day is completed,
+its file is compressed (gzip) and merged into the archive of its month: <BASE_FILE_NAME>-<YEAR>-<MONTH>.csv.gz.
+Each compacted day is appended to the archive as a new gzip member, so the archive is never fully loaded or rewritten.
+The CSV header is only written once, at the creation of the archive.
+Each append is recorded in a journal file (<ARCHIVE>.journal) until the day file has been removed. If the process is
+killed in the middle, the next compaction rolls the append back, so a day is never archived twice.
+
+A retention policy can be defined as a number of months. Archives older than this number of months are deleted.
+
+The compaction can be scheduled on a background worker thread (see CSVArchiver.schedule), so that the writers of the
+day files are not blocked while the previous days are compressed.
+
+The read_history function reads the archives and the remaining day files transparently, in chronological order.
+
+Warning: the files are only identified by their names. A file that follows the naming convention but that has not been
+created by the CSV output may result in unexpected behaviour.
+"""
+from __future__ import annotations
+import csv
+import gzip
+import logging
+import os
+import queue
+import shutil
+import threading
+from datetime import date
+from typing import Iterator, Optional
+
+_FILE_NAME_SEP = '-'
+_DAY_EXT = '.csv'
+_ARCHIVE_EXT = '.csv.gz'
+_JOURNAL_EXT = '.journal'
+_ENCODING = 'utf-8'
+
+
+def _parse_int_parts(name: str, nb_parts: int) -> Optional[tuple]:
+    parts = name.split(_FILE_NAME_SEP)
+    if len(parts) != nb_parts or not all(p.isdigit() for p in parts):
+        return None
+    return tuple(int(p) for p in parts)
+
+
+def _list_files(base_file_name: str) -> ([(date, str)], [((int, int), str)]):
+    """Lists the day files and the month archives of the given base file name, sorted chronologically.
+
+    :return: the list of (day, path) of the day files, and the list of ((year, month), path) of the archives
+    """
+    directory = os.path.dirname(base_file_name)
+    prefix = os.path.basename(base_file_name) + _FILE_NAME_SEP
+    days = []
+    months = []
+
+    for entry in os.listdir(directory if directory != '' else os.curdir):
+        if not entry.startswith(prefix):
+            continue
+        rest = entry[len(prefix):]
+        file_path = os.path.join(directory, entry)
+
+        if rest.endswith(_ARCHIVE_EXT):
+            parts = _parse_int_parts(rest[:-len(_ARCHIVE_EXT)], 2)
+            if parts is not None:
+                months.append((parts, file_path))
+        elif rest.endswith(_DAY_EXT):
+            parts = _parse_int_parts(rest[:-len(_DAY_EXT)], 3)
+            if parts is not None:
+                try:
+                    days.append((date(*parts), file_path))
+                except ValueError:
+                    pass
+
+    days.sort()
+    months.sort()
+    return days, months
+
+
+def archive_file_name(base_file_name: str, year: int, month: int) -> str:
+    return base_file_name + _FILE_NAME_SEP + str(year) + _FILE_NAME_SEP + str(month) + _ARCHIVE_EXT
+
+
+class CSVArchiver:
+    """Compacts the completed day files into monthly gzip archives and applies the retention policy."""
+    _DEFAULT_COMPRESS_LEVEL = 6
+
+    def __init__(self, retention_months: int = None, compress_level: int = _DEFAULT_COMPRESS_LEVEL):
+        """
+        :param int retention_months: number of months to keep, the current one excluded. None to keep everything.
+        :param int compress_level: gzip compression level, between 1 (fastest) and 9 (smallest)
+        """
+        self.retention_months = retention_months
+        self.compress_level = compress_level
+
+        self._queue: queue.Queue = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    def _append_day(self, day_file: str, archive: str) -> None:
+        """Appends the content of the day file to the archive as a new gzip member. The header of the day file is
+        skipped if the archive already exists.
+
+        The append is recorded in a journal, removed once the day file has been removed. If anything fails, the archive
+        is truncated back to its previous size. If the process is killed, the journal is used by _recover.
+        """
+        previous_size = os.path.getsize(archive) if os.path.isfile(archive) else 0
+        journal = archive + _JOURNAL_EXT
+        with open(journal, 'w', encoding=_ENCODING) as file:
+            file.write(f"{previous_size}\n{day_file}\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+        try:
+            with open(day_file, 'rb') as src, gzip.open(archive, 'ab', compresslevel=self.compress_level) as dst:
+                if previous_size > 0:
+                    src.readline()
+                shutil.copyfileobj(src, dst)
+            with open(archive, 'ab') as dst:
+                os.fsync(dst.fileno())
+        except BaseException:
+            with open(archive, 'ab') as dst:
+                dst.truncate(previous_size)
+            os.remove(journal)
+            raise
+
+        os.remove(day_file)
+        os.remove(journal)
+
+    @staticmethod
+    def _recover(base_file_name: str) -> None:
+        """Completes or rolls back the appends interrupted by the end of the process, following their journal.
+
+        If the day file still exists, the archive is truncated back to its size before the append, and the day will
+        be compacted again. Otherwise, the append had been completed and only the journal is removed.
+        """
+        directory = os.path.dirname(base_file_name)
+        prefix = os.path.basename(base_file_name) + _FILE_NAME_SEP
+
+        for entry in os.listdir(directory if directory != '' else os.curdir):
+            if not entry.startswith(prefix) or not entry.endswith(_ARCHIVE_EXT + _JOURNAL_EXT):
+                continue
+            journal = os.path.join(directory, entry)
+            archive = journal[:-len(_JOURNAL_EXT)]
+
+            with open(journal, 'r', encoding=_ENCODING) as file:
+                lines = file.read().splitlines()
+
+            # The journal is synced before the append starts: if it is incomplete, the archive has not been modified
+            if len(lines) != 2 or not lines[0].isdigit():
+                logging.warning(f"Incomplete compaction journal {journal} removed")
+            elif os.path.isfile(lines[1]) and os.path.isfile(archive):
+                with open(archive, 'ab') as dst:
+                    dst.truncate(int(lines[0]))
+                logging.warning(f"Interrupted compaction of {lines[1]} rolled back in {archive}")
+            os.remove(journal)
+
+    def compact(self, base_file_name: str, today: date = None) -> None:
+        """Merges every day file older than today into the archive of its month, then removes it.
+
+        :param str base_file_name: base file name used by the CSV output
+        :param date today: current day, never compacted. Default: the current local day.
+        """
+        today = date.today() if today is None else today
+        self._recover(base_file_name)
+        days, _ = _list_files(base_file_name)
+
+        for day, day_file in days:
+            if day >= today:
+                continue
+            archive = archive_file_name(base_file_name, day.year, day.month)
+            self._append_day(day_file, archive)
+            logging.info(f"{day_file} compacted into {archive}")
+
+    def apply_retention(self, base_file_name: str, today: date = None) -> None:
+        """Deletes the archives older than the retention period.
+
+        :param str base_file_name: base file name used by the CSV output
+        :param date today: current day. Default: the current local day.
+        """
+        if self.retention_months is None:
+            return
+
+        today = date.today() if today is None else today
+        oldest = today.year * 12 + today.month - 1 - self.retention_months
+        _, months = _list_files(base_file_name)
+
+        for (year, month), archive in months:
+            if year * 12 + month - 1 < oldest:
+                os.remove(archive)
+                logging.info(f"{archive} deleted by the retention policy")
+
+    def run(self, base_file_name: str, today: date = None) -> None:
+        self.compact(base_file_name, today)
+        self.apply_retention(base_file_name, today)
+
+    def schedule(self, base_file_name: str, today: date = None) -> None:
+        """Runs the compaction and the retention policy in the background worker thread, started at the first call.
+        The scheduled runs are performed one after the other. A failed run is logged and attempted again at the next
+        schedule.
+
+        :param str base_file_name: base file name used by the CSV output
+        :param date today: current day. Default: the current local day, at the time of the run.
+        """
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work, name="csv-archiver", daemon=True)
+                self._worker.start()
+        self._queue.put((base_file_name, today))
+
+    def wait(self) -> None:
+        """Waits until all the scheduled runs are done."""
+        self._queue.join()
+
+    def _work(self) -> None:
+        while True:
+            base_file_name, today = self._queue.get()
+            try:
+                self.run(base_file_name, today)
+            except Exception as e:
+                logging.warning(f"Compaction of {base_file_name} failed: {e!r}")
+            finally:
+                self._queue.task_done()
+
+
+def read_history(base_file_name: str) -> Iterator[dict]:
+    """Reads, in chronological order, every row written by the CSV output for the given base file name. Monthly
+    archives are decompressed on the fly, without loading them in memory.
+
+    :param str base_file_name: base file name used by the CSV output
+    :return: an iterator over the rows, as dictionaries of strings (see csv.DictReader)
+    """
+    days, months = _list_files(base_file_name)
+    files = [(year, month, 0, archive) for (year, month), archive in months] + \
+            [(day.year, day.month, day.day, day_file) for day, day_file in days]
+    files.sort()
+
+    for *_, file_path in files:
+        if file_path.endswith(_ARCHIVE_EXT):
+            file = gzip.open(file_path, 'rt', encoding=_ENCODING, newline='')
+        else:
+            file = open(file_path, 'r', encoding=_ENCODING, newline='')
+        with file:
+            yield from csv.DictReader(file)
@@ -13,14 +13,20 @@ Example:
 
 This module does not support more complex configuration (SSL, virtual host, login/password).
 
+With lazy=True, the connection is only established at the first operation on the broker. The pika library is itself
+imported lazily (see lazy module), so creating a lazy broker does not import it.
+
 Author: Ludovic Mouline
 """
 from __future__ import annotations
-import configparser
-import pika
 import logging
 from typing import TYPE_CHECKING, Callable
 
+from pv_simulator.lazy import lazy_import
+
+configparser = lazy_import("configparser")
+pika = lazy_import("pika")
+
 if TYPE_CHECKING:
     import pv_simulator.meter
 
@@ -40,15 +46,18 @@ class Broker:
     _connection: pika.BlockingConnection = None
     _channel: pika.adapters.blocking_connection.BlockingChannel = None
 
-    def __init__(self, config_file: str = _DEFAULT_CFG_FILE_NAME):
-        self._init_broker(config_file)
+    def __init__(self, config_file: str = _DEFAULT_CFG_FILE_NAME, lazy: bool = False):
+        self._config_file = config_file
+        self._declared_queues: {str} = set()
+        self._init_broker(config_file, lazy)
 
-    def _init_broker(self, config_file: str) -> None:
+    def _init_broker(self, config_file: str, lazy: bool = False) -> None:
         """Initialises the producer connection following the given configuration file. If no file is given or not well
         written, the default values are used. A warning message is printed if the "broker" section or the file
         is omitted.
 
         :param str config_file: path of the configuration file
+        :param bool lazy: if True, the connection is established at the first operation on the broker
         """
         config = configparser.ConfigParser()
         success_files = config.read(config_file)
@@ -71,45 +80,145 @@ class Broker:
             port = self._DEFAULT_PORT if config[self._SECTION_NAME][self._CFG_PORT] is None \
                 else int(config[self._SECTION_NAME][self._CFG_PORT])
 
-        logging.info(f"Connection attempt with {host}:{port}")
-        self._connection = pika.BlockingConnection(pika.ConnectionParameters(host=host, port=port))
+        self._host = host
+        self._port = port
+        if not lazy:
+            self.connect()
+
+    def connect(self) -> None:
+        """Establishes the connection with the configured broker."""
+        logging.info(f"Connection attempt with {self._host}:{self._port}")
+        self._connection = pika.BlockingConnection(pika.ConnectionParameters(host=self._host, port=self._port))
         self._channel = self._connection.channel()
+        self._declared_queues.clear()
         logging.info("Connection established")
 
+    def _get_channel(self) -> pika.adapters.blocking_connection.BlockingChannel:
+        """Returns the channel, after establishing the connection if it has not been done yet."""
+        if self._channel is None:
+            self.connect()
+        return self._channel
+
+    def disconnect(self) -> None:
+        """Closes the current connection, if still open. The next operation on the broker connects again."""
+        if self._connection is not None and self._connection.is_open:
+            try:
+                self._connection.close()
+            except pika.exceptions.AMQPError:
+                pass
+        self._connection = None
+        self._channel = None
+        self._declared_queues.clear()
+
     def __del__(self):
         """Closes the connection when the broker instance is deleted."""
         if self._connection is not None:
             self._connection.close()
 
     def open_channel(self, meter_id: str) -> None:
-        self._channel.queue_declare(queue=meter_id)
+        """Declares the queue of the meter. The queue is only declared once per connection."""
+        channel = self._get_channel()
+        if meter_id not in self._declared_queues:
+            channel.queue_declare(queue=meter_id)
+            self._declared_queues.add(meter_id)
 
     def del_channel(self, meter_id: str) -> None:
-        self._channel.queue_delete(queue=meter_id)
+        """Deletes the queue of the meter. Nothing is done if the connection has never been established."""
+        self._declared_queues.discard(meter_id)
+        if self._channel is not None:
+            self._channel.queue_delete(queue=meter_id)
 
 
 class Producer(Broker):
-    """Class that handles the connection to the broker by the meter (producer)."""
+    """Class that handles the connection to the broker by the meter (producer).
+
+    In transaction mode, the published messages are only delivered by the broker at commit(), which is the only call
+    that waits for an answer of the broker: a batch of messages costs a single round trip. The messages published since
+    the last commit are discarded by the broker if the connection is lost. commit() raises
+    pika.exceptions.UnroutableError if some messages could not be routed to a queue.
+    """
+
+    def __init__(self, config_file: str = Broker._DEFAULT_CFG_FILE_NAME, lazy: bool = False):
+        self._transactional = False
+        self._returned_messages: [pika.adapters.blocking_connection.ReturnedMessage] = []
+        super().__init__(config_file, lazy)
+
+    def connect(self) -> None:
+        """Establishes the connection and selects the transaction mode if requested."""
+        super().connect()
+        self._returned_messages = []
+        if self._transactional:
+            self._select_transactions()
+
+    def _select_transactions(self) -> None:
+        self._channel.tx_select()
+        self._channel.add_on_return_callback(self._on_return)
+
+    def _on_return(self, channel, method, properties, body: bytes) -> None:
+        # The queue may have been deleted since its declaration: it is declared again at the next attempt
+        self._declared_queues.discard(method.routing_key)
+        self._returned_messages.append(pika.adapters.blocking_connection.ReturnedMessage(method, properties, body))
+
+    def enable_transactions(self) -> None:
+        """Selects the transaction mode on the channel, now if connected or else at the connection."""
+        if not self._transactional:
+            self._transactional = True
+            if self._channel is not None:
+                self._select_transactions()
 
     def send_msg(self, meter: pv_simulator.meter.Meter, msg: str) -> None:
-        self.open_channel(meter.meter_id)
-        self._channel.basic_publish(exchange='', routing_key=meter.meter_id, body=bytes(msg, _ENCODING))
+        self.publish(meter.meter_id, bytes(msg, _ENCODING))
+
+    def publish(self, routing_key: str, body: bytes) -> None:
+        """Publishes the message. In transaction mode, it is only delivered once committed."""
+        self.open_channel(routing_key)
+        if self._transactional:
+            self._get_channel().basic_publish(exchange='', routing_key=routing_key, body=body, mandatory=True)
+        else:
+            self._get_channel().basic_publish(exchange='', routing_key=routing_key, body=body)
+
+    def commit(self) -> None:
+        """Commits the messages published since the last commit (transaction mode only)."""
+        self._get_channel().tx_commit()
+        # The broker returns the unroutable messages before acknowledging the commit: their events are pending
+        self._connection.process_data_events(time_limit=0)
+        if len(self._returned_messages) > 0:
+            returned, self._returned_messages = self._returned_messages, []
+            raise pika.exceptions.UnroutableError(returned)
 
 
 class Consumer(Broker):
     """Class that handles the connection to the broker by the PV service (consumer)"""
 
-    def bind_messages(self, meter_id: str, callback: Callable) -> None:
+    def __init__(self, config_file: str = Broker._DEFAULT_CFG_FILE_NAME, lazy: bool = False):
+        self._bindings: [(str, Callable)] = []
+        super().__init__(config_file, lazy)
+
+    def connect(self) -> None:
+        """Establishes the connection and binds the messages registered before."""
+        super().connect()
+        for meter_id, callback in self._bindings:
+            self._consume(meter_id, callback)
+
+    def _consume(self, meter_id: str, callback: Callable) -> None:
         self.open_channel(meter_id)
         self._channel.basic_consume(queue=meter_id, auto_ack=True, on_message_callback=callback)
 
+    def bind_messages(self, meter_id: str, callback: Callable) -> None:
+        """Binds the callback to the messages of the meter. If the connection has not been established yet, the
+        binding is performed at the connection."""
+        self._bindings.append((meter_id, callback))
+        if self._channel is not None:
+            self._consume(meter_id, callback)
+
     def start_consuming(self) -> None:
         """!!Blocking method!!
         Starts consuming incoming messages in the broker. Should be called after all the messages bindings have been
         performed with the bind_message method.
         """
-        self._channel.start_consuming()
+        self._get_channel().start_consuming()
 
     def stop_consuming(self) -> None:
-        self._channel.stop_consuming()
+        if self._channel is not None:
+            self._channel.stop_consuming()
 
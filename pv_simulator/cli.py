@@ -0,0 +1,195 @@
+"""This module implements the command line interface of the simulator:
+
+    python -m pv_simulator meter [options]
+    python -m pv_simulator pv -ids <METER_ID> [<METER_ID> ...] [options]
+
+The modules of a service are only imported when the service is run, and the brokers are created lazily: nothing is
+connected before the first message is sent or consumed. Starting a short-lived worker therefore costs little more than
+starting the interpreter (see benchmarks/startup.py).
+"""
+from __future__ import annotations
+import argparse
+import logging
+import os
+import sys
+import time
+from typing import TYPE_CHECKING
+
+from pv_simulator.broker import Broker
+
+if TYPE_CHECKING:
+    import pv_simulator.broker
+    import pv_simulator.meter
+    import pv_simulator.profiles
+    import pv_simulator.pv_service
+
+_DEFAULT_PROFILE_FILE_NAME = "profiles.ini"
+# Same as pv_simulator.perf.MODES, not imported to keep the startup light: the profiler is only imported if enabled
+_PERF_MODES = ("cprofile", "sampling")
+
+
+def _profiles(options: argparse.Namespace, nb: int) -> [pv_simulator.profiles.Profile]:
+    """Returns the profiles of the nb meters, assigned in a round-robin fashion, or None for all if no profile is
+    selected."""
+    if options.profiles is None:
+        return [None] * nb
+
+    from pv_simulator.profiles import load_profiles
+    profiles = load_profiles(options.profile_file)
+    for name in options.profiles:
+        if name not in profiles:
+            raise ValueError(f"Unknown profile {name}. Available profiles: {list(profiles)}")
+    return [profiles[options.profiles[i % len(options.profiles)]] for i in range(nb)]
+
+
+def build_parser(prog: str = None) -> argparse.ArgumentParser:
+    broker_parser = argparse.ArgumentParser(add_help=False)
+    broker_parser.add_argument("-conf", "--configuration-file", type=str, default=Broker._DEFAULT_CFG_FILE_NAME,
+                               help=f"path of the broker configuration file. Default: {Broker._DEFAULT_CFG_FILE_NAME}")
+
+    profile_parser = argparse.ArgumentParser(add_help=False)
+    profile_parser.add_argument("-prof-file", "--profile-file", type=str, default=_DEFAULT_PROFILE_FILE_NAME,
+                                help=f"path of the profile configuration file. Default: {_DEFAULT_PROFILE_FILE_NAME}")
+    profile_parser.add_argument("-prof", "--profiles", nargs="+", help="names of the profiles (separated by a space), "
+                                                                       "assigned to the meters in a round-robin "
+                                                                       "fashion. Default: no profile")
+
+    perf_parser = argparse.ArgumentParser(add_help=False)
+    perf_parser.add_argument("-perf-out", "--perf-output", type=str, help="path of the profiling output files. If "
+                                                                          "set, profiling is switched on and off with "
+                                                                          "the SIGUSR1 signal. Default: no profiling")
+    perf_parser.add_argument("-perf-mode", "--perf-mode", choices=_PERF_MODES, default=_PERF_MODES[0],
+                             help=f"profiling mode: cProfile stats or sampled collapsed stacks (flame graph). "
+                                  f"Default: {_PERF_MODES[0]}")
+    perf_parser.add_argument("-perf-start", "--perf-start", action="store_true", help="starts profiling at startup "
+                                                                                      "instead of waiting for "
+                                                                                      "SIGUSR1.")
+
+    arg_parser = argparse.ArgumentParser(prog=prog, description="PV simulator services. "
+                                                                "Please make sure to have a running RabbitMQ instance.")
+    services = arg_parser.add_subparsers(dest="service", required=True)
+
+    meter_parser = services.add_parser("meter", parents=[broker_parser, profile_parser, perf_parser],
+                                       help="runs the meter service.")
+    meter_parser.add_argument("-nb", "--nb-meter", type=int, help="number of meters that should be created. Default: 1")
+    meter_parser.add_argument("-spool", "--spool-dir", type=str, help="directory of the local spool. If set, messages "
+                                                                      "are written in the spool and forwarded to the "
+                                                                      "broker in the background.")
+
+    pv_parser = services.add_parser("pv", parents=[broker_parser, profile_parser, perf_parser],
+                                    help="runs the PV service.")
+    pv_parser.add_argument("-ids", "--meter-ids", nargs="+", help="IDs of the meter (separated by a space).",
+                           required=True)
+    pv_parser.add_argument("-arch", "--archive", action="store_true", help="compacts the CSV files of the previous "
+                                                                           "days into monthly gzip archives.")
+    pv_parser.add_argument("-ret", "--retention-months", type=int, help="number of months of archives to keep, the "
+                                                                        "current one excluded. Implies --archive. "
+                                                                        "Default: keep everything")
+    pv_parser.add_argument("-late", "--lateness-s", type=int, help="maximal lateness of the meter values, in "
+                                                                   "seconds. If set, the values are written in order "
+                                                                   "and without duplicates, with this delay. Default: "
+                                                                   "written as they arrive")
+    return arg_parser
+
+
+def create_meters(options: argparse.Namespace) -> (pv_simulator.broker.Producer, [pv_simulator.meter.Meter]):
+    """Creates the producer and the meters. The connection to the broker is not established."""
+    from pv_simulator.broker import Producer
+    from pv_simulator.meter import MeterFactory
+
+    nb_meter = options.nb_meter if options.nb_meter is not None and options.nb_meter > 0 else 1
+
+    broker = Producer(options.configuration_file, lazy=True)
+    if options.spool_dir is not None:
+        from pv_simulator.spool import Spool, SpooledProducer
+        broker = SpooledProducer(broker, Spool(options.spool_dir))
+
+    meters = [MeterFactory.instance().new_meter(broker, profile) for profile in _profiles(options, nb_meter)]
+    return broker, meters
+
+
+def create_pv_services(options: argparse.Namespace) -> (pv_simulator.broker.Consumer,
+                                                        [pv_simulator.pv_service.PVService]):
+    """Creates the consumer and one PV service per meter. The connection to the broker is only established by the
+    binding of the messages."""
+    from pv_simulator.broker import Consumer
+    from pv_simulator.pv_service import PVService
+    from pv_simulator.out import LoggerOutput, CSVFileOutput
+    from pv_simulator.archive import CSVArchiver
+
+    # A retention policy is only applied to archives
+    archive = options.archive or options.retention_months is not None
+    archiver = CSVArchiver(options.retention_months) if archive else None
+
+    consumer = Consumer(options.configuration_file, lazy=True)
+    profiles = _profiles(options, len(options.meter_ids))
+    pvs = [PVService(meter_id, consumer, LoggerOutput(), CSVFileOutput(meter_id, archiver),
+                     lateness_s=options.lateness_s, profile=profile)
+           for meter_id, profile in zip(options.meter_ids, profiles)]
+    return consumer, pvs
+
+
+def run_meter(options: argparse.Namespace, broker: pv_simulator.broker.Producer,
+              meters: [pv_simulator.meter.Meter]) -> None:
+    logging.info(f"Meter created: {[m.meter_id for m in meters]}")
+
+    if options.spool_dir is not None:
+        broker.start()
+
+    try:
+        while True:
+            for m in meters:
+                m.send_consumption()
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logging.info("Demo stopped by the user. Channels will be destroyed.")
+        if options.spool_dir is not None:
+            broker.stop()
+        raise
+
+
+def run_pv(consumer: pv_simulator.broker.Consumer, pvs: [pv_simulator.pv_service.PVService]) -> None:
+    try:
+        consumer.start_consuming()
+    except KeyboardInterrupt:
+        logging.info("Demo stopped by the user.")
+        for pv in pvs:
+            pv.flush()
+        raise
+
+
+def main(argv: [str] = None, prog: str = None) -> None:
+    logging.getLogger().setLevel(logging.INFO)
+    arg_parser = build_parser(prog)
+    options = arg_parser.parse_args(argv)
+
+    # Invalid profiles or values are reported as usage errors, before anything is started
+    profiler = None
+    try:
+        if options.perf_output is not None:
+            from pv_simulator.perf import Profiler
+            profiler = Profiler(options.perf_output, options.perf_mode)
+        if options.service == "meter":
+            broker, meters = create_meters(options)
+        else:
+            consumer, pvs = create_pv_services(options)
+    except ValueError as e:
+        arg_parser.error(str(e))
+
+    if profiler is not None:
+        profiler.install_signal_handler()
+        if options.perf_start:
+            profiler.start()
+
+    try:
+        if options.service == "meter":
+            run_meter(options, broker, meters)
+        else:
+            run_pv(consumer, pvs)
+    except KeyboardInterrupt:
+        if profiler is not None:
+            profiler.stop()
+        try:
+            sys.exit(0)
+        except SystemExit:
+            os._exit(0)
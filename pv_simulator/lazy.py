@@ -0,0 +1,30 @@
+"""This module implements the lazy import of the heavy dependencies (e.g., pika).
+
+A lazily imported module is registered like any other module, but its code is only executed when one of its
+attributes is accessed for the first time. Short-lived processes that never reach the broker do not pay for its import.
+"""
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Returns the module with the given name. If it has not been imported yet, it will be at the first access to one
+    of its attributes.
+
+    :param str name: absolute name of the module
+    :raises ModuleNotFoundError: if the module cannot be found
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
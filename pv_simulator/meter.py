@@ -2,7 +2,8 @@
 This module implements a meter service.
 A meter service reads a consumption value and sends it to a predefined broker.
 
-The current implementation mocks the reading by generating a uniformly distributed value between 0 and 9000.
+The current implementation mocks the reading by generating a uniformly distributed value between 0 and 9000, or by
+sampling a consumption profile if one is given (see profile module).
 
 Author: Ludovic Mouline
 """
@@ -11,10 +12,14 @@ import logging
 import time
 import json
 from random import uniform
+from time import perf_counter_ns
 from typing import TypedDict, TYPE_CHECKING
 
+from pv_simulator.perf import stage_timings
+
 if TYPE_CHECKING:
     import pv_simulator.broker
+    import pv_simulator.profiles
 
 _MIN_CONS = 0
 _MAX_CONS = 9000
@@ -45,10 +50,10 @@ class MeterFactory:
             MeterFactory()
         return MeterFactory._instance
 
-    def new_meter(self, broker: pv_simulator.broker.Producer) -> Meter:
+    def new_meter(self, broker: pv_simulator.broker.Producer, profile: pv_simulator.profiles.Profile = None) -> Meter:
         m_id = self.__BASE_ID + str(self.__id_next)
         self.__id_next = self.__id_next + 1
-        return Meter(m_id, broker)
+        return Meter(m_id, broker, profile)
 
 
 class Meter:
@@ -59,21 +64,35 @@ class Meter:
     WARNING: this approach cannot be used in a multi-threading application, or the meter id will not be unique.
     """
 
-    def __init__(self, m_id: str, broker: pv_simulator.broker.Producer):
-        """You should not directly call the constructor. We recommended using the factory."""
+    def __init__(self, m_id: str, broker: pv_simulator.broker.Producer, profile: pv_simulator.profiles.Profile = None):
+        """You should not directly call the constructor. We recommended using the factory.
+        The channel is opened by the broker when the first consumption value is sent."""
         self.meter_id = m_id
         self.broker = broker
-        self.broker.open_channel(self.meter_id)
+        self.profile = profile
 
-    def read_consumption(self) -> float:
-        return uniform(_MIN_CONS, _MAX_CONS)
+    def read_consumption(self, time_s: int = None) -> float:
+        """Returns the consumption at the given time (default: now), sampled from the profile if any."""
+        if self.profile is None:
+            return uniform(_MIN_CONS, _MAX_CONS)
+        return self.profile.sample(int(time.time()) if time_s is None else time_s)
 
     def send_consumption(self) -> None:
-        v = self.read_consumption()
-        msg = MeterValMsg(meter_id=self.meter_id, value=v, time_s=int(time.time()))
+        start = perf_counter_ns()
+        time_s = int(time.time())
+        v = self.read_consumption(time_s)
+        read = perf_counter_ns()
+        msg = MeterValMsg(meter_id=self.meter_id, value=v, time_s=time_s)
         to_send = json.dumps(msg)
+        encoded = perf_counter_ns()
         self.broker.send_msg(self, to_send)
+        sent = perf_counter_ns()
         logging.info(f"Message sent: {to_send}")
 
+        stage_timings.record("meter.read", read - start)
+        stage_timings.record("meter.encode", encoded - read)
+        stage_timings.record("meter.send", sent - encoded)
+        stage_timings.record("meter.log", perf_counter_ns() - sent)
+
     def __del__(self):
         self.broker.del_channel(self.meter_id)
@@ -5,11 +5,13 @@ Author: Ludovic Mouline
 """
 from __future__ import annotations
 from logging import info
-from datetime import datetime
+from datetime import datetime, date
 import csv
 from os import path
 from typing import TypedDict
 
+from pv_simulator.archive import CSVArchiver
+
 
 class OutMsg(TypedDict):
     meter_id: str
@@ -46,17 +48,23 @@ class CSVFileOutput(Output):
 
     Warning 2: This method is not supposed to be used in a globally distributed system. The definition of the day is the
     "current local day".
+
+    If an archiver is given, the files of the previous days are compacted into monthly archives at the creation of the
+    output and every time the day changes (see archive module). The compaction runs in the background worker of the
+    archiver: writing the messages is never blocked by it.
     """
     _FILE_NAME_SEP = '-'
     _FILE_EXT = '.csv'
 
-    def __init__(self, base_file_name: str):
+    def __init__(self, base_file_name: str, archiver: CSVArchiver = None):
         self.base_file_name = base_file_name
+        self.archiver = archiver
         self.current_file = None
         self.writer = None
         self.today_file_name = None
 
         self._open()
+        self._archive()
 
     def _csv_file_name(self, date) -> str:
         return self.base_file_name + self._FILE_NAME_SEP + str(date.year) + self._FILE_NAME_SEP + str(date.month) \
@@ -91,6 +99,12 @@ class CSVFileOutput(Output):
 
         self.current_file.flush()
 
+    def _archive(self) -> None:
+        """Schedules the compaction of the files of the previous days, if an archiver has been set."""
+        if self.archiver is not None:
+            today = datetime.today()
+            self.archiver.schedule(self.base_file_name, date(today.year, today.month, today.day))
+
     def _close(self) -> None:
         """
         Closes the current file
@@ -113,10 +127,14 @@ class CSVFileOutput(Output):
 
         file_name = self._today_file_name()
 
-        if file_name != self.today_file_name:
+        day_changed = file_name != self.today_file_name
+        if day_changed:
             # Day has changed from the previous call
             self._close()
             self._open(file_name)
 
         self.writer.writerow(msg)
         self.current_file.flush()
+
+        if day_changed:
+            self._archive()
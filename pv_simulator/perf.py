@@ -0,0 +1,208 @@
+"""This module implements the profiling hooks of the services.
+
+Two tools are available:
+    - the per-stage timings: the PV service callback and the meter record the duration of each of their stages (e.g.,
+      decoding, PV power computation, output). The durations are only aggregated while the timings are enabled,
+    - the profiler, that profiles the main thread (where the services consume or send the messages) either with
+      cProfile or by sampling its stack at a regular interval.
+
+When the profiler stops, it dumps its result into a file and logs a summary of the stage timings. The cProfile mode
+dumps pstats data (see the pstats module, snakeviz, ...). The sampling mode dumps collapsed stacks, one line per stack
+with its number of samples, that can be rendered as a flame graph (e.g., with flamegraph.pl or speedscope).
+
+The profiler can be switched on and off at runtime with the SIGUSR1 signal (POSIX only): kill -USR1 <PID>. Each
+profiling session is dumped into its own file: <OUTPUT>-<SESSION><EXT>.
+"""
+from __future__ import annotations
+import logging
+import os
+import sys
+import threading
+from collections import Counter
+from typing import Optional
+
+from pv_simulator.lazy import lazy_import
+
+# Only needed by the profiler: the services that only record stage timings do not import them
+cProfile = lazy_import("cProfile")
+signal = lazy_import("signal")
+
+_CPROFILE = "cprofile"
+_SAMPLING = "sampling"
+MODES = (_CPROFILE, _SAMPLING)
+
+_NS_PER_MS = 1_000_000
+_NS_PER_US = 1_000
+
+
+class StageTimings:
+    """Aggregates the durations of the stages of the services: number of calls, total and maximal duration."""
+
+    def __init__(self):
+        self.enabled = False
+        self._stats: {str: [int]} = {}
+
+    def record(self, stage: str, duration_ns: int) -> None:
+        """Records one duration of the stage, if the timings are enabled.
+
+        :param str stage: name of the stage
+        :param int duration_ns: duration in nanoseconds (see time.perf_counter_ns)
+        """
+        if not self.enabled:
+            return
+        stats = self._stats.get(stage)
+        if stats is None:
+            self._stats[stage] = [1, duration_ns, duration_ns]
+        else:
+            stats[0] += 1
+            stats[1] += duration_ns
+            if duration_ns > stats[2]:
+                stats[2] = duration_ns
+
+    def reset(self) -> None:
+        self._stats = {}
+
+    def summary(self) -> str:
+        """Returns a table with, for each stage: the number of calls, the total, mean, and maximal durations."""
+        lines = [f"{'stage':<16} {'calls':>10} {'total (ms)':>12} {'mean (us)':>10} {'max (us)':>10}"]
+        for stage, (count, total, maximum) in sorted(self._stats.items()):
+            lines.append(f"{stage:<16} {count:>10} {total / _NS_PER_MS:>12.1f} {total / count / _NS_PER_US:>10.1f} "
+                         f"{maximum / _NS_PER_US:>10.1f}")
+        return "\n".join(lines)
+
+
+# Timings shared by the services of the process
+stage_timings = StageTimings()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class _Sampler(threading.Thread):
+    """Thread that samples the stack of another thread and counts the collapsed stacks."""
+
+    def __init__(self, thread_id: int, interval_s: float):
+        super().__init__(name="profiling-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if len(stack) > 0:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class Profiler:
+    """Profiles the main thread of the process, and enables the stage timings, between start() and stop()."""
+    _DEFAULT_INTERVAL_S = 0.005
+
+    def __init__(self, output: str, mode: str = _CPROFILE, interval_s: float = _DEFAULT_INTERVAL_S,
+                 timings: StageTimings = stage_timings):
+        """
+        :param str output: path of the output files. The session number is added before the extension.
+        :param str mode: "cprofile" or "sampling"
+        :param float interval_s: sampling interval, in seconds (sampling mode only)
+        :param StageTimings timings: stage timings enabled during the profiling
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode {mode}. Available modes: {MODES}")
+        directory = os.path.dirname(output)
+        if directory != "" and not os.path.isdir(directory):
+            raise ValueError(f"The directory of the profiling output {output} does not exist.")
+
+        self.output = output
+        self.mode = mode
+        self.interval_s = interval_s
+        self.timings = timings
+        self.session = 0
+
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[_Sampler] = None
+
+    @property
+    def running(self) -> bool:
+        return self._profile is not None or self._sampler is not None
+
+    def _session_file_name(self) -> str:
+        root, ext = os.path.splitext(self.output)
+        return f"{root}-{self.session}{ext}"
+
+    def start(self) -> None:
+        """Starts a profiling session. In cProfile mode, it should be called from the main thread."""
+        if self.running:
+            return
+
+        self.timings.reset()
+        self.timings.enabled = True
+        if self.mode == _CPROFILE:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = _Sampler(threading.main_thread().ident, self.interval_s)
+            self._sampler.start()
+        logging.info(f"Profiling started ({self.mode})")
+
+    def stop(self) -> Optional[str]:
+        """Stops the profiling session, dumps its result, and logs the stage timings.
+
+        :return: the path of the dumped file, None if no session was running
+        """
+        if not self.running:
+            return None
+
+        file_name = self._session_file_name()
+        # The session is closed even if its result cannot be dumped, so that a new one can be started
+        try:
+            if self._profile is not None:
+                self._profile.disable()
+                self._profile.dump_stats(file_name)
+            else:
+                self._sampler.stop()
+                with open(file_name, "w") as file:
+                    for stack, count in self._sampler.stacks.most_common():
+                        file.write(f"{stack} {count}\n")
+        finally:
+            self._profile = None
+            self._sampler = None
+            self.timings.enabled = False
+            self.session += 1
+
+        logging.info(f"Profiling stopped, result written in {file_name}. Stage timings:\n{self.timings.summary()}")
+        return file_name
+
+    def toggle(self) -> None:
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+    def _on_signal(self, signum, frame) -> None:
+        # An exception raised by a signal handler would be raised in the services
+        try:
+            self.toggle()
+        except OSError as e:
+            logging.warning(f"Profiling could not be toggled: {e}")
+
+    def install_signal_handler(self) -> bool:
+        """Switches the profiler on and off on SIGUSR1. Should be called from the main thread.
+
+        :return: False if the signal is not available on this platform
+        """
+        if not hasattr(signal, "SIGUSR1"):
+            logging.warning("SIGUSR1 is not available on this platform: profiling cannot be toggled at runtime.")
+            return False
+        signal.signal(signal.SIGUSR1, self._on_signal)
+        return True
@@ -0,0 +1,158 @@
+"""This module implements the power profiles used to mock realistic meter and PV values.
+
+The profiles are defined in a <FILE_NAME>.ini file, one section per profile:
+
+    [residential]
+    peak = 6000
+    weekday = 0:0.25, 6:0.3, 7:0.7, 9:0.4, 12:0.45, 17:0.6, 19:1.0, 22:0.5
+    weekend = 0:0.3, 8:0.4, 10:0.7, 13:0.8, 19:1.0, 23:0.4
+    seasonal = 1:1.3, 4:1.0, 7:0.8, 10:1.0
+    noise = 0.1
+
+    - peak: value of the profile when all the factors equal 1 (W for a meter, kW for a PV service),
+    - weekday: daily curve, as a comma-separated list of <HOUR>:<FACTOR>. Hours can be decimal (e.g., 7.5 for 7:30),
+    - weekend: daily curve for Saturdays and Sundays. Optional, the weekday curve is used by default,
+    - seasonal: factor per month, as a comma-separated list of <MONTH>:<FACTOR>. Optional, 1 by default,
+    - noise: relative amplitude of the uniform noise added to each sample. Optional, 0 by default.
+
+The curves are linearly interpolated (cyclically over the day and the year) once, when the profile is created, into
+lookup tables: one value per minute of the day and one factor per day of the year. A sample is then a table lookup,
+a multiplication, and a random noise. The local time is only computed when the hour changes.
+
+Warning: the day, the day of the week, and the month are those of the local time.
+"""
+from __future__ import annotations
+from random import random
+from time import localtime
+
+from pv_simulator.lazy import lazy_import
+
+configparser = lazy_import("configparser")
+
+_MINUTES_PER_DAY = 24 * 60
+_DAYS_PER_YEAR = 366
+_DAYS_PER_MONTH = _DAYS_PER_YEAR / 12
+_SATURDAY = 5
+
+_CFG_PEAK = "peak"
+_CFG_WEEKDAY = "weekday"
+_CFG_WEEKEND = "weekend"
+_CFG_SEASONAL = "seasonal"
+_CFG_NOISE = "noise"
+
+_POINT_SEP = ','
+_KEY_VALUE_SEP = ':'
+
+
+def _parse_points(points: str) -> {float: float}:
+    """Parses a comma-separated list of <KEY>:<VALUE>."""
+    parsed = {}
+    for point in points.split(_POINT_SEP):
+        key, value = point.split(_KEY_VALUE_SEP)
+        parsed[float(key)] = float(value)
+    return parsed
+
+
+def _interpolate(points: {float: float}, period: float, size: int) -> [float]:
+    """Returns the table of size values obtained by linear interpolation of the points, cyclic over the period.
+    The i-th value of the table corresponds to the position i * period / size.
+    """
+    if len(points) == 0:
+        raise ValueError("At least one point is required.")
+
+    positions = sorted(points)
+    for p in positions:
+        if p < 0 or p >= period:
+            raise ValueError(f"Position {p} is out of the period [0, {period}[.")
+
+    table = []
+    # Index of the next point after the current position, the last point being wrapped before the first one
+    nxt = 0
+    for i in range(size):
+        x = i * period / size
+        while nxt < len(positions) and positions[nxt] <= x:
+            nxt += 1
+        prev_x = positions[nxt - 1] if nxt > 0 else positions[-1] - period
+        next_x = positions[nxt] if nxt < len(positions) else positions[0] + period
+        prev_y = points[positions[nxt - 1]]
+        next_y = points[positions[nxt % len(positions)]]
+        table.append(prev_y + (next_y - prev_y) * (x - prev_x) / (next_x - prev_x) if next_x != prev_x else prev_y)
+    return table
+
+
+class Profile:
+    """Power profile with precomputed daily and seasonal lookup tables."""
+
+    def __init__(self, name: str, peak: float, weekday: {float: float}, weekend: {float: float} = None,
+                 seasonal: {int: float} = None, noise: float = 0.):
+        """
+        :param str name: name of the profile
+        :param float peak: value of the profile when all the factors equal 1
+        :param dict weekday: factor per hour of the day (from 0 included to 24 excluded)
+        :param dict weekend: factor per hour of the day for the weekend. Default: the weekday factors
+        :param dict seasonal: factor per month (from 1 to 12). Default: 1 for all months
+        :param float noise: relative amplitude of the uniform noise
+        """
+        self.name = name
+        self.noise = noise
+
+        self._weekday = [peak * f for f in _interpolate(weekday, 24, _MINUTES_PER_DAY)]
+        self._weekend = self._weekday if weekend is None else \
+            [peak * f for f in _interpolate(weekend, 24, _MINUTES_PER_DAY)]
+        # Month factors are placed at the middle of their month
+        self._seasonal = [1.] * _DAYS_PER_YEAR if seasonal is None else \
+            _interpolate({(m - 1 + 0.5) * _DAYS_PER_MONTH: f for m, f in seasonal.items()}, _DAYS_PER_YEAR,
+                         _DAYS_PER_YEAR)
+        self._current_hour = (0, 0, self._weekday, 0, 1.)
+
+    def _hour(self, time_s: int) -> (int, int, [float], int, float):
+        """Computes the local hour that contains the given time.
+
+        :return: the start and end of the hour, the daily table and index of its first minute, and the seasonal factor
+        """
+        t = localtime(time_s)
+        start = time_s - t.tm_min * 60 - t.tm_sec
+        daily = self._weekend if t.tm_wday >= _SATURDAY else self._weekday
+        return start, start + 3600, daily, t.tm_hour * 60, self._seasonal[t.tm_yday - 1]
+
+    def value(self, time_s: int) -> float:
+        """Returns the value of the profile, without noise, at the given time."""
+        # The local time is only computed once per hour: time zone changes happen on hour boundaries
+        start, end, daily, first_minute, seasonal = self._current_hour
+        if not start <= time_s < end:
+            self._current_hour = start, end, daily, first_minute, seasonal = self._hour(time_s)
+        return daily[first_minute + (time_s - start) // 60] * seasonal
+
+    def sample(self, time_s: int) -> float:
+        """Returns the value of the profile at the given time, with noise. The result is never negative."""
+        v = self.value(time_s) * (1 + self.noise * (2 * random() - 1))
+        return v if v > 0 else 0.
+
+
+def load_profiles(config_file: str) -> {str: Profile}:
+    """Loads the profiles defined in the given configuration file, one per section.
+
+    :param str config_file: path of the configuration file
+    :return: the profiles by name
+    :raises ValueError: if the file cannot be read or if a profile is not well defined
+    """
+    config = configparser.ConfigParser()
+    try:
+        if len(config.read(config_file)) == 0:
+            raise ValueError(f"The profile file {config_file} cannot be read.")
+    except configparser.Error as e:
+        raise ValueError(f"The profile file {config_file} is not valid: {e}") from e
+
+    profiles = {}
+    for name in config.sections():
+        section = config[name]
+        if _CFG_PEAK not in section or _CFG_WEEKDAY not in section:
+            raise ValueError(f"The profile {name} should define at least \"{_CFG_PEAK}\" and \"{_CFG_WEEKDAY}\".")
+
+        weekend = _parse_points(section[_CFG_WEEKEND]) if _CFG_WEEKEND in section else None
+        seasonal = {int(m): f for m, f in _parse_points(section[_CFG_SEASONAL]).items()} \
+            if _CFG_SEASONAL in section else None
+
+        profiles[name] = Profile(name, section.getfloat(_CFG_PEAK), _parse_points(section[_CFG_WEEKDAY]), weekend,
+                                 seasonal, section.getfloat(_CFG_NOISE, 0.))
+    return profiles
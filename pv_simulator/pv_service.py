@@ -1,16 +1,25 @@
 """This module is responsible for the PV service.
 
 It consumes a meter value, reads its own power value, adds the two and writes it to an output (see out module).
+If a lateness is given, the meter values are reordered and deduplicated by time_s before being processed (see reorder
+module).
 
 Author: Ludovic Mouline
 """
+from __future__ import annotations
 import json
-from time import localtime
+from time import localtime, perf_counter_ns
 from math import cos, fabs
 from random import random
+from typing import TYPE_CHECKING
 
 import pv_simulator.broker
 from pv_simulator.out import Output, OutMsg
+from pv_simulator.perf import stage_timings
+from pv_simulator.reorder import ReorderBuffer
+
+if TYPE_CHECKING:
+    from pv_simulator.profiles import Profile
 
 # Below constants are used to mock a PV power value
 # The value should not exceed the _MAX_POWER_KW, and we assume that its value always equals 0 between _SUN_RISE_H
@@ -64,22 +73,58 @@ def _rand_power(time_s: int, factor: float, shift_noise: float) -> float:
 class PVService:
     """Encapsulates the behaviour of a PV service"""
 
-    def __init__(self, meter_id: str, consumer: pv_simulator.broker.Consumer, *outputs: Output):
+    def __init__(self, meter_id: str, consumer: pv_simulator.broker.Consumer, *outputs: Output,
+                 lateness_s: int = None, profile: Profile = None):
+        """
+        :param int lateness_s: if set, maximal lateness in seconds of the meter values. The values are then written in
+        order of time_s and at most once per second. By default, they are written as they arrive.
+        :param Profile profile: if set, the PV power values (in kW) are sampled from this profile instead of the
+        default cosine curve.
+        """
         factor = random() * _MAX_POWER_KW
         shift_noise = _shift_noise()
         self.consumer = consumer
-
-        def callback(ch, method, properties, body):
-            message = json.loads(body)  # Message is json string build from the meter.MeterValMsg typed dictionary
-
-            pv_power_value = _rand_power(message["time_s"], factor, shift_noise)
+        reorder_buffer = None if lateness_s is None else ReorderBuffer(lateness_s)
+        self.reorder_buffer = reorder_buffer
+
+        def process(message: dict) -> None:
+            start = perf_counter_ns()
+            if profile is None:
+                pv_power_value = _rand_power(message["time_s"], factor, shift_noise)
+            else:
+                pv_power_value = profile.sample(message["time_s"])
             sum_power_w = pv_power_value * 1_000 + message["value"]
+            computed = perf_counter_ns()
 
             for output in outputs:
                 output.out(OutMsg(meter_id=meter_id, time_s=message["time_s"], meter_power_value_w=message["value"],
                                   pv_power_value_kw=pv_power_value, sum_meter_pv_w=sum_power_w))
 
+            stage_timings.record("pv.power", computed - start)
+            stage_timings.record("pv.output", perf_counter_ns() - computed)
+
+        def callback(ch, method, properties, body):
+            start = perf_counter_ns()
+            message = json.loads(body)  # Message is json string build from the meter.MeterValMsg typed dictionary
+            stage_timings.record("pv.decode", perf_counter_ns() - start)
+
+            if reorder_buffer is None:
+                process(message)
+            else:
+                start = perf_counter_ns()
+                released = reorder_buffer.push(message["time_s"], message)
+                stage_timings.record("pv.reorder", perf_counter_ns() - start)
+                for m in released:
+                    process(m)
+
+        self._process = process
         self.consumer.bind_messages(meter_id, callback)
 
+    def flush(self) -> None:
+        """Processes the meter values still held by the reorder buffer, if any."""
+        if self.reorder_buffer is not None:
+            for m in self.reorder_buffer.flush():
+                self._process(m)
+
     def __del__(self):
         self.consumer.stop_consuming()
@@ -0,0 +1,85 @@
+"""This module implements the reordering and the deduplication of the meter values by time_s.
+
+Redeliveries and multi-producer setups can deliver the values of one meter twice or out of order. The reorder buffer
+holds the values for a bounded lateness window (in seconds) and releases them sorted by time_s, each second at most once.
+
+A value is released once a value at least lateness_s seconds more recent has been received. A value is only dropped if
+its second is not more recent than the last released one: it is then either a duplicate or too late to be written in
+order. The seconds still held in the window are tracked in a bitmap, so the state is bounded by the window size and
+does not grow with the history.
+
+Warning: the values are only released when new values arrive. If the meter stops sending values, the last ones stay in
+the buffer until flush() is called.
+"""
+from __future__ import annotations
+import heapq
+import logging
+from typing import Any, Optional
+
+
+class ReorderBuffer:
+    """Reorder and deduplication buffer for the values of one meter."""
+
+    def __init__(self, lateness_s: int):
+        """
+        :param int lateness_s: maximal lateness, in seconds, of a value compared to the most recent one received.
+        0 to only deduplicate and drop the out-of-order values without any delay.
+        """
+        if lateness_s < 0:
+            raise ValueError("The lateness should be positive or 0.")
+
+        self.lateness_s = lateness_s
+        self.nb_dropped = 0
+
+        self._heap: [(int, Any)] = []
+        self._max_time_s: Optional[int] = None
+        self._last_released: Optional[int] = None
+        # Bit i of _seen is set if second _max_time_s - lateness_s + 1 + i has been received and is still buffered
+        self._seen = 0
+
+    def _release(self, watermark: int) -> [Any]:
+        """Releases, sorted by time, the buffered values whose time is not more recent than the watermark."""
+        released = []
+        while len(self._heap) > 0 and self._heap[0][0] <= watermark:
+            time_s, value = heapq.heappop(self._heap)
+            self._last_released = time_s
+            released.append(value)
+        return released
+
+    def push(self, time_s: int, value: Any) -> [Any]:
+        """Adds a value to the buffer.
+
+        :param int time_s: time of the value, in seconds
+        :param value: value to buffer
+        :return: the values released by this call, sorted by time
+        """
+        if self._last_released is not None and time_s <= self._last_released:
+            self.nb_dropped += 1
+            logging.debug(f"Value at {time_s} dropped (duplicate or not more recent than {self._last_released})")
+            return []
+
+        if self._max_time_s is None:
+            self._max_time_s = time_s
+        elif time_s > self._max_time_s:
+            self._seen >>= time_s - self._max_time_s
+            self._max_time_s = time_s
+
+        watermark = self._max_time_s - self.lateness_s
+        # Values not more recent than the watermark are released by this call: none of them has been received before,
+        # as all the values received up to the watermark have already been released.
+        if time_s > watermark:
+            bit = 1 << (time_s - watermark - 1)
+            if self._seen & bit:
+                self.nb_dropped += 1
+                logging.debug(f"Value at {time_s} dropped (duplicate)")
+                return []
+            self._seen |= bit
+
+        heapq.heappush(self._heap, (time_s, value))
+        return self._release(watermark)
+
+    def flush(self) -> [Any]:
+        """Releases all the buffered values, sorted by time."""
+        released = self._release(self._max_time_s) if self._max_time_s is not None else []
+        self._seen = 0
+        return released
@@ -0,0 +1,338 @@
+"""This module implements a local write-ahead spool between the meters and the broker.
+
+When the broker is down or slow, sending a consumption value directly through the producer either raises or blocks,
+and the reading is lost. With the spool, meters append their messages to a memory-mapped segment file (at memory
+speed), and a background forwarder drains the spool to the broker in bulk.
+
+The spool is a directory that contains numbered segment files (<INDEX>.seg). Each segment has a fixed size and starts
+with a header that stores two checkpointed offsets:
+    - the write offset: end of the last complete record,
+    - the confirmed offset: end of the last record successfully published to the broker.
+
+Records are appended one after the other as: <KEY LENGTH (2 bytes)><BODY LENGTH (4 bytes)><KEY><BODY>. The write offset
+is updated after the record has been fully written, so a partial record is never visible after a crash. When a record
+does not fit in the current segment, a new segment is created. A segment is removed once all its records have been
+confirmed and a newer segment exists.
+
+The spool is a single FIFO log. Therefore, the messages of one meter are forwarded in the order they have been sent.
+After a restart, records before the confirmed offset are skipped. Records published just before a crash but not yet
+checkpointed may be sent twice (at-least-once delivery).
+
+Warning: the mmap content is written back to the disk by the operating system. It survives a crash of the process but
+not necessarily a crash of the host, unless sync() is called.
+"""
+from __future__ import annotations
+import logging
+import mmap
+import os
+import struct
+import threading
+from typing import NamedTuple, Optional, TYPE_CHECKING
+
+from pv_simulator.lazy import lazy_import
+
+pika = lazy_import("pika")
+
+if TYPE_CHECKING:
+    import pv_simulator.broker
+    import pv_simulator.meter
+
+_ENCODING = 'utf-8'
+
+_MAGIC = b'PVSP'
+# magic, write offset, confirmed offset
+_HEADER = struct.Struct('<4sQQ')
+_HEADER_SIZE = 32
+_WRITE_OFFSET_POS = 4
+_CONFIRMED_OFFSET_POS = 12
+_OFFSET = struct.Struct('<Q')
+
+# key length, body length
+_RECORD_HEADER = struct.Struct('<HI')
+
+_SEGMENT_EXT = '.seg'
+_DEFAULT_SEGMENT_SIZE = 4 * 1024 * 1024
+
+
+class SpoolRecord(NamedTuple):
+    """A record read from the spool. The segment and end offset are used to confirm the record."""
+    routing_key: str
+    body: bytes
+    segment: int
+    end_offset: int
+
+
+class _Segment:
+    """One memory-mapped segment file of the spool."""
+
+    def __init__(self, file_path: str, size: int, create: bool):
+        self.file_path = file_path
+
+        if create:
+            self._file = open(file_path, 'w+b')
+            self._file.truncate(size)
+        else:
+            self._file = open(file_path, 'r+b')
+
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self.size = len(self._map)
+
+        if create:
+            _HEADER.pack_into(self._map, 0, _MAGIC, _HEADER_SIZE, _HEADER_SIZE)
+        else:
+            magic, _, _ = _HEADER.unpack_from(self._map, 0)
+            if magic != _MAGIC:
+                self.close()
+                raise ValueError(f"{file_path} is not a spool segment file.")
+
+    @property
+    def write_offset(self) -> int:
+        return _OFFSET.unpack_from(self._map, _WRITE_OFFSET_POS)[0]
+
+    @write_offset.setter
+    def write_offset(self, offset: int) -> None:
+        _OFFSET.pack_into(self._map, _WRITE_OFFSET_POS, offset)
+
+    @property
+    def confirmed_offset(self) -> int:
+        return _OFFSET.unpack_from(self._map, _CONFIRMED_OFFSET_POS)[0]
+
+    @confirmed_offset.setter
+    def confirmed_offset(self, offset: int) -> None:
+        _OFFSET.pack_into(self._map, _CONFIRMED_OFFSET_POS, offset)
+
+    def fits(self, record_size: int) -> bool:
+        return self.write_offset + record_size <= self.size
+
+    def append(self, key: bytes, body: bytes) -> None:
+        offset = self.write_offset
+        _RECORD_HEADER.pack_into(self._map, offset, len(key), len(body))
+        offset += _RECORD_HEADER.size
+        self._map[offset:offset + len(key)] = key
+        offset += len(key)
+        self._map[offset:offset + len(body)] = body
+        # Published last: a partially written record is never visible
+        self.write_offset = offset + len(body)
+
+    def read(self, offset: int) -> (bytes, bytes, int):
+        """Reads the record that starts at the given offset.
+
+        :return: the key, the body, and the end offset of the record
+        """
+        key_len, body_len = _RECORD_HEADER.unpack_from(self._map, offset)
+        offset += _RECORD_HEADER.size
+        key = self._map[offset:offset + key_len]
+        offset += key_len
+        body = self._map[offset:offset + body_len]
+        return key, body, offset + body_len
+
+    def sync(self) -> None:
+        self._map.flush()
+
+    def close(self) -> None:
+        if not self._map.closed:
+            self._map.close()
+        self._file.close()
+
+
+class Spool:
+    """Append-only spool made of memory-mapped segment files.
+
+    The spool can be used by one writer thread and one reader thread at the same time.
+    """
+
+    def __init__(self, directory: str, segment_size: int = _DEFAULT_SEGMENT_SIZE):
+        if segment_size <= _HEADER_SIZE + _RECORD_HEADER.size:
+            raise ValueError(f"The segment size should be greater than {_HEADER_SIZE + _RECORD_HEADER.size} bytes.")
+
+        self.directory = directory
+        self.segment_size = segment_size
+        self._segments: {int: _Segment} = {}
+        self._cond = threading.Condition()
+
+        os.makedirs(directory, exist_ok=True)
+        indexes = sorted(int(f[:-len(_SEGMENT_EXT)]) for f in os.listdir(directory) if f.endswith(_SEGMENT_EXT))
+
+        if len(indexes) == 0:
+            self._read_idx = self._write_idx = 0
+            self._segments[0] = _Segment(self._segment_path(0), segment_size, create=True)
+        else:
+            self._read_idx = indexes[0]
+            self._write_idx = indexes[-1]
+            for idx in indexes:
+                self._segments[idx] = _Segment(self._segment_path(idx), segment_size, create=False)
+
+    def _segment_path(self, idx: int) -> str:
+        return os.path.join(self.directory, f"{idx:010d}{_SEGMENT_EXT}")
+
+    def append(self, routing_key: str, body: bytes) -> None:
+        """Appends a message at the end of the spool.
+
+        :param str routing_key: routing key used to publish the message
+        :param bytes body: content of the message
+        """
+        key = bytes(routing_key, _ENCODING)
+        record_size = _RECORD_HEADER.size + len(key) + len(body)
+        if _HEADER_SIZE + record_size > self.segment_size:
+            raise ValueError(f"The record ({record_size} bytes) does not fit in a segment of {self.segment_size} "
+                             f"bytes.")
+
+        with self._cond:
+            segment = self._segments[self._write_idx]
+            if not segment.fits(record_size):
+                self._write_idx += 1
+                segment = _Segment(self._segment_path(self._write_idx), self.segment_size, create=True)
+                self._segments[self._write_idx] = segment
+            segment.append(key, body)
+            self._cond.notify()
+
+    def _drop_confirmed_segments(self) -> None:
+        """Removes the fully confirmed segments that are not the current write segment."""
+        while self._read_idx < self._write_idx:
+            segment = self._segments[self._read_idx]
+            if segment.confirmed_offset < segment.write_offset:
+                return
+            segment.close()
+            os.remove(segment.file_path)
+            del self._segments[self._read_idx]
+            self._read_idx += 1
+
+    def read_batch(self, max_records: int) -> [SpoolRecord]:
+        """Returns, without removing them, at most max_records records following the last confirmed one.
+        All the records come from the same segment.
+        """
+        with self._cond:
+            self._drop_confirmed_segments()
+            segment = self._segments[self._read_idx]
+            offset = segment.confirmed_offset
+            end = segment.write_offset
+            records: [SpoolRecord] = []
+
+            while offset < end and len(records) < max_records:
+                key, body, offset = segment.read(offset)
+                records.append(SpoolRecord(str(key, _ENCODING), body, self._read_idx, offset))
+
+            return records
+
+    def confirm(self, record: SpoolRecord) -> None:
+        """Checkpoints the given record, and all the previous ones, as successfully forwarded."""
+        with self._cond:
+            self._segments[record.segment].confirmed_offset = record.end_offset
+
+    def pending(self) -> bool:
+        """Returns True if some records have not been confirmed yet."""
+        with self._cond:
+            return self._read_idx != self._write_idx or \
+                self._segments[self._read_idx].confirmed_offset < self._segments[self._read_idx].write_offset
+
+    def wait(self, timeout: float) -> bool:
+        """Waits until some records are pending or the timeout expires.
+
+        :return: True if some records are pending
+        """
+        with self._cond:
+            return self._cond.wait_for(self.pending, timeout)
+
+    def sync(self) -> None:
+        """Writes the segments back to the disk."""
+        with self._cond:
+            for segment in self._segments.values():
+                segment.sync()
+
+    def close(self) -> None:
+        with self._cond:
+            for segment in self._segments.values():
+                segment.close()
+            self._segments.clear()
+
+
+class SpooledProducer:
+    """Producer that writes the messages into a spool. A background thread forwards them to the broker in bulk.
+
+    It can be used in place of a pv_simulator.broker.Producer by the meters. The wrapped producer is only used by
+    the forwarder thread (or under its lock), as pika connections are not thread-safe.
+
+    Each batch is published in a transaction of the wrapped producer: the records are only confirmed in the spool once
+    the broker has acknowledged the commit, and the whole batch costs a single round trip. If the batch fails, the
+    broker discards its uncommitted messages and the whole batch is sent again.
+    """
+    _DEFAULT_BATCH_SIZE = 512
+    _DEFAULT_RETRY_DELAY_S = 1.
+
+    def __init__(self, producer: pv_simulator.broker.Producer, spool: Spool, batch_size: int = _DEFAULT_BATCH_SIZE,
+                 retry_delay_s: float = _DEFAULT_RETRY_DELAY_S):
+        self.producer = producer
+        self.producer.enable_transactions()
+        self.spool = spool
+        self.batch_size = batch_size
+        self.retry_delay_s = retry_delay_s
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def open_channel(self, meter_id: str) -> None:
+        """The queue is declared by the forwarder when the first message of the meter is published."""
+        pass
+
+    def del_channel(self, meter_id: str) -> None:
+        with self._lock:
+            try:
+                self.producer.del_channel(meter_id)
+            except pika.exceptions.AMQPError as e:
+                logging.warning(f"Channel {meter_id} could not be deleted: {e!r}")
+
+    def send_msg(self, meter: pv_simulator.meter.Meter, msg: str) -> None:
+        self.spool.append(meter.meter_id, bytes(msg, _ENCODING))
+
+    def forward(self) -> int:
+        """Forwards one batch of spooled messages to the broker, in one transaction. The batch is confirmed in the spool
+        once committed.
+
+        The lock is only held for each call to the broker, so that the other users of the producer (e.g., del_channel)
+        do not wait for the whole batch.
+
+        :return: the number of messages forwarded
+        """
+        records = self.spool.read_batch(self.batch_size)
+        if len(records) == 0:
+            return 0
+
+        for record in records:
+            with self._lock:
+                self.producer.publish(record.routing_key, record.body)
+        with self._lock:
+            self.producer.commit()
+        self.spool.confirm(records[-1])
+        return len(records)
+
+    def _disconnect(self) -> None:
+        """Closes the connection, discarding the uncommitted messages. The next batch connects again."""
+        with self._lock:
+            self.producer.disconnect()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if not self.spool.wait(self.retry_delay_s):
+                continue
+            try:
+                self.forward()
+            except pika.exceptions.AMQPError as e:
+                logging.warning(f"Messages could not be forwarded to the broker, retrying in {self.retry_delay_s}s: "
+                                f"{e!r}")
+                self._stop.wait(self.retry_delay_s)
+                self._disconnect()
+
+    def start(self) -> None:
+        """Starts the forwarder thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="spool-forwarder", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None) -> None:
+        """Stops the forwarder thread. Messages that have not been forwarded stay in the spool."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.spool.sync()
@@ -0,0 +1,139 @@
+import gzip
+import os
+import shutil
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from pv_simulator.archive import CSVArchiver, archive_file_name, read_history
+
+_HEADER = "meter_id,time_s,meter_power_value_w,pv_power_value_kw,sum_meter_pv_w\n"
+
+
+class TestCSVArchiver(unittest.TestCase):
+    TEST_FILE_FOLDER = "tmp-test-archive"
+    BASE = f"{TEST_FILE_FOLDER}{os.sep}test"
+
+    def setUp(self) -> None:
+        os.mkdir(self.TEST_FILE_FOLDER)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.TEST_FILE_FOLDER)
+
+    def _write_day(self, year: int, month: int, day: int, *time_s: int) -> str:
+        file_name = f"{self.BASE}-{year}-{month}-{day}.csv"
+        with open(file_name, "w") as file:
+            file.write(_HEADER)
+            for t in time_s:
+                file.write(f"Meter ID,{t},1.0,2.0,2001.0\n")
+        return file_name
+
+    @patch('pv_simulator.archive.logging')
+    def test_compact(self, _):
+        day1 = self._write_day(2021, 1, 30, 1, 2)
+        day2 = self._write_day(2021, 1, 31, 3)
+        day3 = self._write_day(2021, 2, 1, 4)
+        today = self._write_day(2021, 2, 2, 5)
+
+        CSVArchiver().compact(self.BASE, date(2021, 2, 2))
+
+        self.assertFalse(os.path.exists(day1))
+        self.assertFalse(os.path.exists(day2))
+        self.assertFalse(os.path.exists(day3))
+        self.assertTrue(os.path.exists(today))
+
+        with gzip.open(archive_file_name(self.BASE, 2021, 1), "rt") as file:
+            lines = file.readlines()
+        self.assertEqual([_HEADER, "Meter ID,1,1.0,2.0,2001.0\n", "Meter ID,2,1.0,2.0,2001.0\n",
+                          "Meter ID,3,1.0,2.0,2001.0\n"], lines)
+        self.assertTrue(os.path.exists(archive_file_name(self.BASE, 2021, 2)))
+
+    @patch('pv_simulator.archive.logging')
+    def test_read_history(self, _):
+        self._write_day(2020, 12, 31, 1)
+        self._write_day(2021, 1, 1, 2)
+        self._write_day(2021, 1, 2, 3)
+        CSVArchiver().compact(self.BASE, date(2021, 1, 2))
+        self._write_day(2021, 1, 3, 4)
+
+        self.assertEqual(["1", "2", "3", "4"], [row["time_s"] for row in read_history(self.BASE)])
+
+    @patch('pv_simulator.archive.logging')
+    def test_retention(self, _):
+        for month in range(1, 13):
+            self._write_day(2020, month, 1, month)
+        archiver = CSVArchiver(retention_months=2)
+        archiver.run(self.BASE, date(2020, 12, 15))
+
+        self.assertEqual(["10", "11", "12"], [row["time_s"] for row in read_history(self.BASE)])
+        self.assertFalse(os.path.exists(archive_file_name(self.BASE, 2020, 9)))
+
+    @patch('pv_simulator.archive.logging')
+    def test_recover_interrupted_compaction(self, _):
+        self._write_day(2021, 1, 1, 1)
+        day2 = self._write_day(2021, 1, 2, 2)
+        CSVArchiver().compact(self.BASE, date(2021, 1, 2))
+
+        # Process killed after the append of day 2 to the archive, but before the removal of its file
+        archive = archive_file_name(self.BASE, 2021, 1)
+        previous_size = os.path.getsize(archive)
+        with open(f"{archive}.journal", "w") as file:
+            file.write(f"{previous_size}\n{day2}\n")
+        with open(day2, "rb") as src, gzip.open(archive, "ab") as dst:
+            src.readline()
+            dst.write(src.read())
+
+        CSVArchiver().compact(self.BASE, date(2021, 1, 3))
+
+        self.assertFalse(os.path.exists(day2))
+        self.assertFalse(os.path.exists(f"{archive}.journal"))
+        self.assertEqual(["1", "2"], [row["time_s"] for row in read_history(self.BASE)])
+
+    @patch('pv_simulator.archive.logging')
+    def test_recover_completed_compaction(self, _):
+        self._write_day(2021, 1, 1, 1)
+        CSVArchiver().compact(self.BASE, date(2021, 1, 2))
+
+        # Process killed after the removal of the day file, but before the removal of the journal
+        archive = archive_file_name(self.BASE, 2021, 1)
+        with open(f"{archive}.journal", "w") as file:
+            file.write(f"0\n{self.BASE}-2021-1-1.csv\n")
+
+        CSVArchiver().compact(self.BASE, date(2021, 1, 3))
+
+        self.assertFalse(os.path.exists(f"{archive}.journal"))
+        self.assertEqual(["1"], [row["time_s"] for row in read_history(self.BASE)])
+
+    @patch('pv_simulator.archive.logging')
+    def test_recover_incomplete_journal(self, logging_mock):
+        day1 = self._write_day(2021, 1, 1, 1)
+        # Process killed while writing the journal, before the append
+        archive = archive_file_name(self.BASE, 2021, 1)
+        with open(f"{archive}.journal", "w") as file:
+            file.write("12")
+
+        CSVArchiver().compact(self.BASE, date(2021, 1, 2))
+
+        self.assertFalse(os.path.exists(day1))
+        self.assertFalse(os.path.exists(f"{archive}.journal"))
+        self.assertEqual(["1"], [row["time_s"] for row in read_history(self.BASE)])
+        logging_mock.warning.assert_called_once()
+
+    @patch('pv_simulator.archive.logging')
+    def test_schedule(self, _):
+        self._write_day(2021, 1, 1, 1)
+        day2 = self._write_day(2021, 1, 2, 2)
+        archiver = CSVArchiver()
+        archiver.schedule(self.BASE, date(2021, 1, 2))
+        archiver.schedule(self.BASE, date(2021, 1, 3))
+        archiver.wait()
+
+        self.assertFalse(os.path.exists(day2))
+        self.assertEqual(["1", "2"], [row["time_s"] for row in read_history(self.BASE)])
+
+    def test_ignores_other_files(self):
+        self._write_day(2021, 1, 1, 1)
+        with open(f"{self.BASE}-other-2021-1-1.csv", "w") as file:
+            file.write(_HEADER)
+
+        self.assertEqual(["1"], [row["time_s"] for row in read_history(self.BASE)])
@@ -2,6 +2,8 @@ import logging
 import unittest
 from unittest.mock import patch, Mock
 
+import pika.exceptions
+
 from pv_simulator.broker import Producer, Consumer
 
 
@@ -54,6 +56,28 @@ class TestBroker(NoLoggerTest):
         broker.del_channel(meter_id)
         pika_mock.BlockingConnection().channel().queue_delete.assert_called_once_with(queue=meter_id)
 
+    @patch('pv_simulator.broker.pika')
+    def test_disconnect(self, pika_mock):
+        broker = Producer("tests/broker-test.ini")
+        broker.disconnect()
+        pika_mock.BlockingConnection().close.assert_called_once()
+        self.assertEqual(1, pika_mock.ConnectionParameters.call_count)
+
+        broker.open_channel("Meter <ID>")
+        pika_mock.ConnectionParameters.assert_called_with(host="192.168.74.98", port=123456)
+        self.assertEqual(2, pika_mock.ConnectionParameters.call_count)
+
+    @patch('pv_simulator.broker.pika')
+    def test_lazy_connection(self, pika_mock):
+        broker = Producer(lazy=True)
+        pika_mock.BlockingConnection.assert_not_called()
+
+        broker.del_channel("Meter <ID>")
+        pika_mock.BlockingConnection.assert_not_called()
+
+        broker.open_channel("Meter <ID>")
+        pika_mock.BlockingConnection.assert_called_once()
+
 
 class TestProducer(NoLoggerTest):
 
@@ -71,6 +95,19 @@ class TestProducer(NoLoggerTest):
                                                                                        routing_key=mock_meter.meter_id,
                                                                                        body=bytes("False msg", "utf-8"))
 
+    @patch('pv_simulator.broker.pika')
+    def test_transactions(self, pika_mock):
+        channel = pika_mock.BlockingConnection().channel()
+        broker = Producer()
+        broker.enable_transactions()
+        channel.tx_select.assert_called_once()
+
+        broker.publish("Meter <ID>", b"msg 0")
+        broker.publish("Meter <ID>", b"msg 1")
+        channel.tx_commit.assert_not_called()
+        broker.commit()
+        channel.tx_commit.assert_called_once()
+
 
 class TestConsumer(NoLoggerTest):
     @patch('pv_simulator.broker.pika')
@@ -88,6 +125,23 @@ class TestConsumer(NoLoggerTest):
                                                                                        on_message_callback=callback)
         pika_mock.BlockingConnection().channel().start_consuming.assert_not_called()
 
+    @patch('pv_simulator.broker.pika')
+    def test_lazy_bind_messages(self, pika_mock):
+        consumer = Consumer(lazy=True)
+
+        meter_id = "Meter <ID>"
+
+        def callback(): pass
+
+        consumer.bind_messages(meter_id, callback)
+        pika_mock.BlockingConnection.assert_not_called()
+
+        consumer.start_consuming()
+        pika_mock.BlockingConnection().channel().basic_consume.assert_called_once_with(queue=meter_id,
+                                                                                       auto_ack=True,
+                                                                                       on_message_callback=callback)
+        pika_mock.BlockingConnection().channel().start_consuming.assert_called_once()
+
     @patch('pv_simulator.broker.pika')
     def test_start_consuming(self, pika_mock):
         consumer = Consumer()
@@ -0,0 +1,91 @@
+import os
+import shutil
+import subprocess
+import sys
+import unittest
+from unittest.mock import patch
+
+from pv_simulator import cli
+from pv_simulator.meter import MeterFactory
+
+
+class TestCLI(unittest.TestCase):
+    def tearDown(self) -> None:
+        MeterFactory._instance = None
+
+    def test_parser(self):
+        options = cli.build_parser().parse_args(["meter", "-conf", "test.ini", "-nb", "3"])
+        self.assertEqual("meter", options.service)
+        self.assertEqual("test.ini", options.configuration_file)
+        self.assertEqual(3, options.nb_meter)
+
+        options = cli.build_parser().parse_args(["pv", "-ids", "Meter_0", "Meter_1", "-arch", "-ret", "2"])
+        self.assertEqual("pv", options.service)
+        self.assertEqual(["Meter_0", "Meter_1"], options.meter_ids)
+        self.assertTrue(options.archive)
+        self.assertEqual(2, options.retention_months)
+
+    @patch('pv_simulator.broker.logging')
+    @patch('pv_simulator.broker.pika')
+    def test_create_meters_without_connection(self, pika_mock, _):
+        options = cli.build_parser().parse_args(["meter", "-nb", "3"])
+        _, meters = cli.create_meters(options)
+
+        self.assertEqual(["Meter_0", "Meter_1", "Meter_2"], [m.meter_id for m in meters])
+        pika_mock.BlockingConnection.assert_not_called()
+
+    @patch('pv_simulator.broker.logging')
+    @patch('pv_simulator.broker.pika')
+    def test_create_pv_services_without_connection(self, pika_mock, _):
+        test_folder = "tmp-test-cli"
+        os.mkdir(test_folder)
+        try:
+            options = cli.build_parser().parse_args(["pv", "-ids", f"{test_folder}{os.sep}Meter_0"])
+            _, pvs = cli.create_pv_services(options)
+            self.assertEqual(1, len(pvs))
+            pika_mock.BlockingConnection.assert_not_called()
+            del pvs
+        finally:
+            shutil.rmtree(test_folder)
+
+    @patch('pv_simulator.archive.CSVArchiver')
+    @patch('pv_simulator.broker.logging')
+    @patch('pv_simulator.broker.pika')
+    def test_retention_implies_archive(self, _, __, archiver_mock):
+        test_folder = "tmp-test-cli"
+        os.mkdir(test_folder)
+        try:
+            options = cli.build_parser().parse_args(["pv", "-ids", f"{test_folder}{os.sep}Meter_0", "-ret", "2"])
+            _, pvs = cli.create_pv_services(options)
+            archiver_mock.assert_called_once_with(2)
+            del pvs
+        finally:
+            shutil.rmtree(test_folder)
+
+    @patch('sys.stderr')
+    @patch('pv_simulator.broker.pika')
+    def test_invalid_profiles_reported(self, pika_mock, stderr_mock):
+        for args in (["-prof-file", "missing.ini", "-prof", "residential"],
+                     ["-prof-file", "profiles.ini", "-prof", "unknown"]):
+            with self.assertRaises(SystemExit) as cm:
+                cli.main(["meter"] + args, prog="pv_simulator")
+            self.assertEqual(2, cm.exception.code)
+        pika_mock.BlockingConnection.assert_not_called()
+
+    @patch('sys.stderr')
+    def test_invalid_perf_output_reported(self, _):
+        with self.assertRaises(SystemExit) as cm:
+            cli.main(["meter", "-perf-out", f"missing{os.sep}out.prof"], prog="pv_simulator")
+        self.assertEqual(2, cm.exception.code)
+
+    def test_pika_imported_lazily(self):
+        code = "import sys, pv_simulator.cli, pv_simulator.spool; print('pika.connection' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual("False", result.stdout.strip())
+
+    def test_profiler_imported_lazily(self):
+        code = "import sys, pv_simulator.cli, pv_simulator.meter, pv_simulator.pv_service; " \
+               "print('_lsprof' in sys.modules, 'pv_simulator.perf' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        # The stage timings are imported by the services, but not the profiler dependencies
+        self.assertEqual("False True", result.stdout.strip())
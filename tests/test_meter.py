@@ -41,6 +41,14 @@ class MeterTest(unittest.TestCase):
         mock_broker.send_msg.assert_called_once_with(meter, expected_to_send)
         mock_logging.info.assert_called_once()
 
+    def test_read_consumption_profile(self):
+        mock_profile = Mock()
+        mock_profile.sample.return_value = 1234.5
+        meter = MeterFactory.instance().new_meter(Mock(), mock_profile)
+
+        self.assertEqual(1234.5, meter.read_consumption(19354789))
+        mock_profile.sample.assert_called_once_with(19354789)
+
     def test_deletion(self):
         mock_broker = Mock()
         meter_id = "Meter ID"
@@ -1,8 +1,9 @@
 import os
 import shutil
 import unittest
-from unittest.mock import patch
+from unittest.mock import patch, Mock
 import pv_simulator.out
+from pv_simulator.archive import CSVArchiver
 from os import path, remove
 
 
@@ -108,3 +109,47 @@ class TestCSVFile(unittest.TestCase):
             self.assertEqual("Meter ID,1549,500.35,0.2,700.35", lines[1].strip())
 
         remove(file_name)
+
+    @patch('pv_simulator.out.datetime')
+    def test_archiver_on_changing_day(self, mocked_date):
+        mocked_date.today().year = self.YEAR
+        mocked_date.today().month = self.MONTH
+        mocked_date.today().day = self.DAY - 1
+
+        archiver = Mock()
+        base_file_name = f"{self.TEST_FILE_FOLDER}{os.sep}test"
+        file = pv_simulator.out.CSVFileOutput(base_file_name, archiver)
+        archiver.schedule.assert_called_once()
+
+        mocked_date.today().day = self.DAY
+        file.out(pv_simulator.out.OutMsg(meter_id="Meter ID", time_s=1549, pv_power_value_kw=0.2,
+                                         meter_power_value_w=500.35, sum_meter_pv_w=700.35))
+        del file
+
+        self.assertEqual(2, archiver.schedule.call_count)
+        self.assertEqual(base_file_name, archiver.schedule.call_args.args[0])
+        self.assertEqual(self.DAY, archiver.schedule.call_args.args[1].day)
+        archiver.run.assert_not_called()
+
+    @patch('pv_simulator.archive.logging')
+    @patch('pv_simulator.out.datetime')
+    def test_archiver_failure(self, mocked_date, mocked_logging):
+        mocked_date.today().year = self.YEAR
+        mocked_date.today().month = self.MONTH
+        mocked_date.today().day = self.DAY - 1
+
+        archiver = CSVArchiver()
+        with patch.object(archiver, 'run', side_effect=OSError("No space left on device")):
+            file = pv_simulator.out.CSVFileOutput(f"{self.TEST_FILE_FOLDER}{os.sep}test", archiver)
+
+            mocked_date.today().day = self.DAY
+            file.out(pv_simulator.out.OutMsg(meter_id="Meter ID", time_s=1549, pv_power_value_kw=0.2,
+                                             meter_power_value_w=500.35, sum_meter_pv_w=700.35))
+            del file
+            archiver.wait()
+
+        # Both runs failed in the background, the worker is still running
+        self.assertEqual(2, mocked_logging.warning.call_count)
+        with open(f"{self.TEST_FILE_FOLDER}{os.sep}test-{self.YEAR}-{self.MONTH}-{self.DAY}.csv", "r") as file:
+            lines = file.readlines()
+            self.assertEqual("Meter ID,1549,500.35,0.2,700.35", lines[1].strip())
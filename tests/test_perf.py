@@ -0,0 +1,144 @@
+import logging
+import os
+import pstats
+import shutil
+import signal
+import time
+import unittest
+
+from pv_simulator.perf import Profiler, StageTimings
+
+
+def _busy_function(duration_s: float) -> None:
+    end = time.perf_counter() + duration_s
+    while time.perf_counter() < end:
+        pass
+
+
+class TestStageTimings(unittest.TestCase):
+    def test_disabled(self):
+        timings = StageTimings()
+        timings.record("stage", 10)
+        self.assertEqual(1, len(timings.summary().splitlines()))
+
+    def test_enabled(self):
+        timings = StageTimings()
+        timings.enabled = True
+        timings.record("stage", 1_000)
+        timings.record("stage", 3_000)
+        timings.record("other", 2_000)
+
+        lines = timings.summary().splitlines()
+        self.assertEqual(3, len(lines))
+        self.assertEqual(["other", "1", "0.0", "2.0", "2.0"], lines[1].split())
+        self.assertEqual(["stage", "2", "0.0", "2.0", "3.0"], lines[2].split())
+
+        timings.reset()
+        self.assertEqual(1, len(timings.summary().splitlines()))
+
+
+class TestProfiler(unittest.TestCase):
+    TEST_FILE_FOLDER = "tmp-test-perf"
+
+    def setUp(self) -> None:
+        logging.getLogger().disabled = True
+        os.mkdir(self.TEST_FILE_FOLDER)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.TEST_FILE_FOLDER)
+        logging.getLogger().disabled = False
+
+    def test_cprofile(self):
+        timings = StageTimings()
+        profiler = Profiler(f"{self.TEST_FILE_FOLDER}{os.sep}out.prof", timings=timings)
+        self.assertIsNone(profiler.stop())
+
+        profiler.start()
+        self.assertTrue(timings.enabled)
+        _busy_function(0.01)
+        file_name = profiler.stop()
+
+        self.assertFalse(timings.enabled)
+        self.assertEqual(f"{self.TEST_FILE_FOLDER}{os.sep}out-0.prof", file_name)
+        functions = [f for _, _, f in pstats.Stats(file_name).stats]
+        self.assertIn("_busy_function", functions)
+
+    def test_sampling(self):
+        profiler = Profiler(f"{self.TEST_FILE_FOLDER}{os.sep}out.collapsed", mode="sampling", interval_s=0.001,
+                            timings=StageTimings())
+        profiler.start()
+        _busy_function(0.1)
+        file_name = profiler.stop()
+
+        with open(file_name) as file:
+            lines = file.readlines()
+        self.assertGreater(len(lines), 0)
+        self.assertTrue(any("test_perf.py:_busy_function" in line for line in lines))
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            self.assertGreater(int(count), 0)
+
+    def test_toggle_sessions(self):
+        profiler = Profiler(f"{self.TEST_FILE_FOLDER}{os.sep}out.prof", timings=StageTimings())
+        for _ in range(2):
+            profiler.toggle()
+            self.assertTrue(profiler.running)
+            profiler.toggle()
+            self.assertFalse(profiler.running)
+
+        self.assertTrue(os.path.exists(f"{self.TEST_FILE_FOLDER}{os.sep}out-0.prof"))
+        self.assertTrue(os.path.exists(f"{self.TEST_FILE_FOLDER}{os.sep}out-1.prof"))
+
+    @unittest.skipUnless(hasattr(signal, "SIGUSR1"), "SIGUSR1 is not available on this platform")
+    def test_signal_handler(self):
+        previous = signal.getsignal(signal.SIGUSR1)
+        try:
+            profiler = Profiler(f"{self.TEST_FILE_FOLDER}{os.sep}out.prof", timings=StageTimings())
+            self.assertTrue(profiler.install_signal_handler())
+
+            os.kill(os.getpid(), signal.SIGUSR1)
+            self.assertTrue(profiler.running)
+            os.kill(os.getpid(), signal.SIGUSR1)
+            self.assertFalse(profiler.running)
+        finally:
+            signal.signal(signal.SIGUSR1, previous)
+
+    def test_failed_dump(self):
+        timings = StageTimings()
+        profiler = Profiler(f"{self.TEST_FILE_FOLDER}{os.sep}out.prof", timings=timings)
+        profiler.start()
+        shutil.rmtree(self.TEST_FILE_FOLDER)
+        try:
+            with self.assertRaises(OSError):
+                profiler.stop()
+        finally:
+            os.mkdir(self.TEST_FILE_FOLDER)
+
+        self.assertFalse(profiler.running)
+        self.assertFalse(timings.enabled)
+        profiler.start()
+        self.assertEqual(f"{self.TEST_FILE_FOLDER}{os.sep}out-1.prof", profiler.stop())
+
+    def test_signal_handler_failed_dump(self):
+        previous = signal.getsignal(signal.SIGUSR1)
+        try:
+            profiler = Profiler(f"{self.TEST_FILE_FOLDER}{os.sep}out.collapsed", mode="sampling",
+                                timings=StageTimings())
+            profiler.install_signal_handler()
+            os.kill(os.getpid(), signal.SIGUSR1)
+            shutil.rmtree(self.TEST_FILE_FOLDER)
+
+            # The dump fails, but no exception is raised in the interrupted code
+            os.kill(os.getpid(), signal.SIGUSR1)
+            self.assertFalse(profiler.running)
+        finally:
+            os.mkdir(self.TEST_FILE_FOLDER)
+            signal.signal(signal.SIGUSR1, previous)
+
+    def test_missing_output_directory(self):
+        with self.assertRaises(ValueError):
+            Profiler(f"{self.TEST_FILE_FOLDER}{os.sep}missing{os.sep}out.prof")
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            Profiler("out", mode="unknown")
@@ -0,0 +1,91 @@
+import os
+import shutil
+import unittest
+from time import mktime
+
+from pv_simulator.profiles import Profile, load_profiles, _interpolate
+
+
+def _local_time_s(year: int, month: int, day: int, hour: int, minute: int = 0) -> int:
+    return int(mktime((year, month, day, hour, minute, 0, 0, 0, -1)))
+
+
+class TestInterpolate(unittest.TestCase):
+    def test_linear(self):
+        self.assertEqual([0., 0.5, 1., 0.5], _interpolate({0: 0., 2: 1.}, 4, 4))
+
+    def test_cyclic(self):
+        table = _interpolate({2: 0., 5: 1.}, 6, 6)
+        for expected, value in zip([2 / 3, 1 / 3, 0., 1 / 3, 2 / 3, 1.], table):
+            self.assertAlmostEqual(expected, value)
+
+    def test_single_point(self):
+        self.assertEqual([3., 3., 3.], _interpolate({1: 3.}, 3, 3))
+
+    def test_out_of_period(self):
+        with self.assertRaises(ValueError):
+            _interpolate({24: 1.}, 24, 1440)
+
+
+class TestProfile(unittest.TestCase):
+    def test_weekday_weekend(self):
+        profile = Profile("test", 1000, weekday={0: 0., 12: 1.}, weekend={0: 0.5})
+
+        # 2021-03-10 was a Wednesday, 2021-03-13 a Saturday
+        self.assertAlmostEqual(1000, profile.value(_local_time_s(2021, 3, 10, 12)))
+        self.assertAlmostEqual(500, profile.value(_local_time_s(2021, 3, 10, 6)))
+        self.assertAlmostEqual(500, profile.value(_local_time_s(2021, 3, 13, 12)))
+
+    def test_minute_resolution(self):
+        profile = Profile("test", 60, weekday={0: 0., 1: 1.})
+        self.assertAlmostEqual(30, profile.value(_local_time_s(2021, 3, 10, 0, 30)))
+        self.assertAlmostEqual(45, profile.value(_local_time_s(2021, 3, 10, 0, 45) + 59))
+
+    def test_seasonal(self):
+        profile = Profile("test", 100, weekday={0: 1.}, seasonal={1: 2., 7: 1.})
+        self.assertAlmostEqual(200, profile.value(_local_time_s(2021, 1, 16, 12)), delta=2)
+        self.assertAlmostEqual(100, profile.value(_local_time_s(2021, 7, 16, 12)), delta=2)
+
+    def test_noise(self):
+        profile = Profile("test", 100, weekday={0: 1.}, noise=0.1)
+        time_s = _local_time_s(2021, 3, 10, 12)
+        for _ in range(100):
+            self.assertTrue(90 <= profile.sample(time_s) <= 110)
+
+
+class TestLoadProfiles(unittest.TestCase):
+    TEST_FILE_FOLDER = "tmp-test-profiles"
+
+    def setUp(self) -> None:
+        os.mkdir(self.TEST_FILE_FOLDER)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.TEST_FILE_FOLDER)
+
+    def _write(self, content: str) -> str:
+        file_name = f"{self.TEST_FILE_FOLDER}{os.sep}profiles.ini"
+        with open(file_name, "w") as file:
+            file.write(content)
+        return file_name
+
+    def test_load(self):
+        profiles = load_profiles(self._write("[home]\npeak = 100\nweekday = 0:0.5, 12:1\nnoise = 0.1\n\n"
+                                             "[office]\npeak = 10\nweekday = 0:1\nseasonal = 1:1, 7:2\n"))
+        self.assertEqual(["home", "office"], list(profiles))
+        self.assertEqual(0.1, profiles["home"].noise)
+        self.assertAlmostEqual(100, profiles["home"].value(_local_time_s(2021, 3, 10, 12)))
+
+    def test_repository_profiles(self):
+        self.assertEqual({"residential", "commercial", "pv_residential"}, set(load_profiles("profiles.ini")))
+
+    def test_missing_file(self):
+        with self.assertRaises(ValueError):
+            load_profiles(f"{self.TEST_FILE_FOLDER}{os.sep}missing.ini")
+
+    def test_missing_weekday(self):
+        with self.assertRaises(ValueError):
+            load_profiles(self._write("[home]\npeak = 100\n"))
+
+    def test_invalid_file(self):
+        with self.assertRaises(ValueError):
+            load_profiles(self._write("peak = 100\n"))
@@ -56,3 +56,28 @@ class TestModuleFunctions(unittest.TestCase):
         PVService("Meter ID", mock_broker, mock_out)
 
         self.assertTrue(check['called'])
+
+    @patch("pv_simulator.pv_service._rand_power")
+    def test_msg_reordered(self, mocked_rand_power: MagicMock):
+        mock_out = Mock()
+        mock_broker = Mock()
+        mocked_rand_power.return_value = 2.5
+
+        PVService("Meter ID", mock_broker, mock_out, lateness_s=2)
+        callback = mock_broker.bind_messages.call_args.args[1]
+
+        for time_s in [10, 12, 11, 12, 13, 14, 10]:
+            callback(None, None, None, json.dumps(MeterValMsg(meter_id="Meter ID", time_s=time_s, value=1.)))
+
+        self.assertEqual([10, 11, 12], [c.args[0]['time_s'] for c in mock_out.out.call_args_list])
+
+    @patch("pv_simulator.pv_service.stage_timings")
+    def test_stage_timings(self, mocked_timings: MagicMock):
+        mock_broker = Mock()
+        mock_body = MeterValMsg(meter_id="Meter ID", time_s=124, value=84.35)
+        mock_broker.bind_messages = lambda m_id, callback: callback(None, None, None, json.dumps(mock_body))
+
+        PVService("Meter ID", mock_broker, Mock())
+
+        self.assertEqual(["pv.decode", "pv.power", "pv.output"],
+                         [c.args[0] for c in mocked_timings.record.call_args_list])
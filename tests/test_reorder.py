@@ -0,0 +1,79 @@
+import logging
+import unittest
+
+from pv_simulator.reorder import ReorderBuffer
+
+
+class TestReorderBuffer(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.getLogger().disabled = True
+
+    def tearDown(self) -> None:
+        logging.getLogger().disabled = False
+
+    def _push_all(self, buffer: ReorderBuffer, times: [int]) -> [int]:
+        released = []
+        for t in times:
+            released.extend(buffer.push(t, t))
+        return released + buffer.flush()
+
+    def test_in_order(self):
+        self.assertEqual([1, 2, 3, 4], self._push_all(ReorderBuffer(2), [1, 2, 3, 4]))
+
+    def test_reorder(self):
+        self.assertEqual([1, 2, 3, 4, 5], self._push_all(ReorderBuffer(2), [2, 1, 4, 3, 5]))
+
+    def test_duplicates(self):
+        buffer = ReorderBuffer(3)
+        self.assertEqual([1, 2, 3, 4], self._push_all(buffer, [1, 2, 1, 3, 2, 4, 4]))
+        self.assertEqual(3, buffer.nb_dropped)
+
+    def test_too_late(self):
+        buffer = ReorderBuffer(2)
+        released = []
+        for t in [10, 11, 12, 13]:
+            released.extend(buffer.push(t, t))
+        self.assertEqual([10, 11], released)
+
+        # 10 and 11 have been released, 9 is too late
+        self.assertEqual([], buffer.push(9, 9))
+        self.assertEqual([], buffer.push(11, 11))
+        self.assertEqual(2, buffer.nb_dropped)
+        self.assertEqual([12, 13], buffer.flush())
+
+    def test_late_but_not_released(self):
+        buffer = ReorderBuffer(3)
+        # 7 is exactly lateness_s late and released immediately, 8 is still buffered
+        self.assertEqual([7, 8, 9, 10], self._push_all(buffer, [10, 8, 7, 9]))
+        self.assertEqual(0, buffer.nb_dropped)
+
+    def test_gap_filled_late(self):
+        buffer = ReorderBuffer(2)
+        released = []
+        for t in [10, 20, 15, 21]:
+            released.extend(buffer.push(t, t))
+        # 15 is later than the window, but more recent than the last released second: it is still written in order
+        self.assertEqual([10, 15], released)
+        self.assertEqual(0, buffer.nb_dropped)
+
+    def test_no_lateness(self):
+        buffer = ReorderBuffer(0)
+        self.assertEqual([5], buffer.push(5, 5))
+        self.assertEqual([], buffer.push(4, 4))
+        self.assertEqual([], buffer.push(5, 5))
+        self.assertEqual([6], buffer.push(6, 6))
+
+    def test_bounded_state(self):
+        buffer = ReorderBuffer(10)
+        for t in range(100_000):
+            buffer.push(t, t)
+        self.assertLessEqual(len(buffer._heap), 11)
+        self.assertLess(buffer._seen.bit_length(), 12)
+
+        # A jump in time does not allocate a bitmap of the size of the jump
+        buffer.push(10 ** 12, 0)
+        self.assertLess(buffer._seen.bit_length(), 12)
+
+    def test_negative_lateness(self):
+        with self.assertRaises(ValueError):
+            ReorderBuffer(-1)
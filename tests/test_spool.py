@@ -0,0 +1,222 @@
+import logging
+import os
+import shutil
+import unittest
+from unittest.mock import Mock, patch
+
+import pika.exceptions
+
+from pv_simulator.broker import Producer
+from pv_simulator.spool import Spool, SpooledProducer
+
+
+class TestSpool(unittest.TestCase):
+    TEST_FILE_FOLDER = "tmp-test-spool"
+
+    def setUp(self) -> None:
+        os.mkdir(self.TEST_FILE_FOLDER)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.TEST_FILE_FOLDER)
+
+    def test_append_read_confirm(self):
+        spool = Spool(self.TEST_FILE_FOLDER)
+        self.assertFalse(spool.pending())
+
+        spool.append("Meter_0", b"msg 0")
+        spool.append("Meter_1", b"msg 1")
+        spool.append("Meter_0", b"msg 2")
+        self.assertTrue(spool.pending())
+
+        records = spool.read_batch(2)
+        self.assertEqual([("Meter_0", b"msg 0"), ("Meter_1", b"msg 1")], [(r.routing_key, r.body) for r in records])
+
+        # Not confirmed: the same records are read again
+        self.assertEqual(records, spool.read_batch(2))
+
+        spool.confirm(records[-1])
+        records = spool.read_batch(10)
+        self.assertEqual([("Meter_0", b"msg 2")], [(r.routing_key, r.body) for r in records])
+
+        spool.confirm(records[-1])
+        self.assertFalse(spool.pending())
+        self.assertEqual([], spool.read_batch(10))
+        spool.close()
+
+    def test_recovery_skips_confirmed(self):
+        spool = Spool(self.TEST_FILE_FOLDER)
+        for i in range(5):
+            spool.append("Meter_0", bytes(f"msg {i}", "utf-8"))
+        spool.confirm(spool.read_batch(3)[-1])
+        spool.close()
+
+        spool = Spool(self.TEST_FILE_FOLDER)
+        self.assertEqual([b"msg 3", b"msg 4"], [r.body for r in spool.read_batch(10)])
+        spool.close()
+
+    def test_segment_rotation(self):
+        spool = Spool(self.TEST_FILE_FOLDER, segment_size=64)
+        for i in range(10):
+            spool.append("M", bytes(f"msg {i}", "utf-8"))
+        self.assertGreater(len(os.listdir(self.TEST_FILE_FOLDER)), 1)
+
+        bodies = []
+        while spool.pending():
+            records = spool.read_batch(100)
+            bodies.extend(r.body for r in records)
+            spool.confirm(records[-1])
+
+        self.assertEqual([bytes(f"msg {i}", "utf-8") for i in range(10)], bodies)
+        self.assertEqual(1, len(os.listdir(self.TEST_FILE_FOLDER)))
+        spool.close()
+
+    def test_record_too_large(self):
+        spool = Spool(self.TEST_FILE_FOLDER, segment_size=64)
+        with self.assertRaises(ValueError):
+            spool.append("M", b"0" * 64)
+        spool.close()
+
+
+class TestSpooledProducer(unittest.TestCase):
+    TEST_FILE_FOLDER = "tmp-test-spool"
+
+    def setUp(self) -> None:
+        logging.getLogger().disabled = True
+        os.mkdir(self.TEST_FILE_FOLDER)
+        self.spool = Spool(self.TEST_FILE_FOLDER)
+
+    def tearDown(self) -> None:
+        self.spool.close()
+        shutil.rmtree(self.TEST_FILE_FOLDER)
+        logging.getLogger().disabled = False
+
+    def test_send_and_forward(self):
+        mock_producer = Mock()
+        mock_meter = Mock()
+        mock_meter.meter_id = "Meter_0"
+
+        producer = SpooledProducer(mock_producer, self.spool)
+        producer.send_msg(mock_meter, "msg 0")
+        producer.send_msg(mock_meter, "msg 1")
+        mock_producer.publish.assert_not_called()
+
+        self.assertEqual(2, producer.forward())
+        self.assertEqual([("Meter_0", b"msg 0"), ("Meter_0", b"msg 1")],
+                         [c.args for c in mock_producer.publish.call_args_list])
+        self.assertFalse(self.spool.pending())
+
+    def test_partial_failure(self):
+        mock_producer = Mock()
+        mock_producer.publish.side_effect = [None, pika.exceptions.AMQPConnectionError(), None, None, None]
+        for i in range(3):
+            self.spool.append("Meter_0", bytes(f"msg {i}", "utf-8"))
+
+        producer = SpooledProducer(mock_producer, self.spool)
+        with self.assertRaises(pika.exceptions.AMQPError):
+            producer.forward()
+        mock_producer.commit.assert_not_called()
+
+        # The transaction has not been committed: the whole batch is sent again
+        self.assertEqual(3, producer.forward())
+        mock_producer.commit.assert_called_once()
+        self.assertEqual([b"msg 0", b"msg 1", b"msg 0", b"msg 1", b"msg 2"],
+                         [c.args[1] for c in mock_producer.publish.call_args_list])
+    def test_forwarder_thread(self):
+        mock_producer = Mock()
+        producer = SpooledProducer(mock_producer, self.spool, retry_delay_s=0.01)
+        producer.start()
+        self.spool.append("Meter_0", b"msg")
+
+        for _ in range(100):
+            if not self.spool.pending():
+                break
+            producer._stop.wait(0.01)
+        producer.stop()
+
+        self.assertFalse(self.spool.pending())
+        mock_producer.publish.assert_called_once_with("Meter_0", b"msg")
+
+    @patch('pv_simulator.broker.pika')
+    def test_one_round_trip_per_batch(self, pika_mock):
+        pika_mock.exceptions = pika.exceptions
+        channel = pika_mock.BlockingConnection().channel()
+        for i in range(1000):
+            self.spool.append(f"Meter_{i % 2}", b"msg")
+
+        producer = SpooledProducer(Producer(lazy=True), self.spool, batch_size=500)
+        self.assertEqual(500, producer.forward())
+        self.assertEqual(500, producer.forward())
+
+        # Only these calls wait for an answer of the broker: the publications are not acknowledged one by one
+        self.assertEqual(1, channel.tx_select.call_count)
+        self.assertEqual(2, channel.queue_declare.call_count)
+        self.assertEqual(2, channel.tx_commit.call_count)
+        self.assertEqual(1000, channel.basic_publish.call_count)
+        channel.confirm_delivery.assert_not_called()
+        for c in channel.basic_publish.call_args_list:
+            self.assertTrue(c.kwargs["mandatory"])
+
+    @patch('pv_simulator.broker.pika')
+    def test_connection_lost_before_commit(self, pika_mock):
+        pika_mock.exceptions = pika.exceptions
+        channel = pika_mock.BlockingConnection().channel()
+        # The messages are written on the socket, but the connection drops before the broker acknowledges the commit
+        channel.tx_commit.side_effect = [pika.exceptions.StreamLostError(), None]
+        for i in range(3):
+            self.spool.append("Meter_0", bytes(f"msg {i}", "utf-8"))
+
+        producer = SpooledProducer(Producer(lazy=True), self.spool)
+        with self.assertRaises(pika.exceptions.AMQPError):
+            producer.forward()
+        self.assertEqual([b"msg 0", b"msg 1", b"msg 2"], [r.body for r in self.spool.read_batch(10)])
+
+        producer._disconnect()
+        self.assertEqual(1, pika_mock.BlockingConnection.call_count - 1)
+        self.assertEqual(3, producer.forward())
+        # Connected again by the forward only
+        self.assertEqual(2, pika_mock.BlockingConnection.call_count - 1)
+        self.assertEqual(2, channel.tx_select.call_count)
+        self.assertFalse(self.spool.pending())
+        self.assertEqual([b"msg 0", b"msg 1", b"msg 2"] * 2,
+                         [c.kwargs["body"] for c in channel.basic_publish.call_args_list])
+
+    @patch('pv_simulator.broker.pika')
+    def test_unroutable(self, pika_mock):
+        pika_mock.exceptions = pika.exceptions
+        channel = pika_mock.BlockingConnection().channel()
+        method = Mock()
+        method.routing_key = "Meter_0"
+
+        def commit():
+            # The broker returns the message before acknowledging the commit (only the first time)
+            if channel.tx_commit.call_count == 1:
+                channel.add_on_return_callback.call_args.args[0](channel, method, Mock(), b"msg")
+
+        channel.tx_commit.side_effect = commit
+        self.spool.append("Meter_0", b"msg")
+
+        producer = SpooledProducer(Producer(lazy=True), self.spool)
+        with self.assertRaises(pika.exceptions.UnroutableError):
+            producer.forward()
+        self.assertTrue(self.spool.pending())
+
+        self.assertEqual(1, producer.forward())
+        self.assertFalse(self.spool.pending())
+        # The queue is declared again
+        self.assertEqual(2, channel.queue_declare.call_count)
+
+    @patch('pv_simulator.broker.pika')
+    def test_queue_declared_once_per_connection(self, pika_mock):
+        pika_mock.exceptions = pika.exceptions
+        channel = pika_mock.BlockingConnection().channel()
+        for i in range(10):
+            self.spool.append(f"Meter_{i % 2}", b"msg")
+
+        producer = SpooledProducer(Producer(), self.spool)
+        self.assertEqual(10, producer.forward())
+        self.assertEqual(2, channel.queue_declare.call_count)
+
+        producer.producer.disconnect()
+        self.spool.append("Meter_0", b"msg")
+        producer.forward()
+        self.assertEqual(3, channel.queue_declare.call_count)